@@ -0,0 +1,56 @@
+# /agentic-ai-system/agent_registry.py
+
+import time
+import logging
+
+REGISTRY_KEY = "registered_agents"
+AGENT_METADATA_PREFIX = "agent:"
+REGISTRY_CHANNEL = "registry:events"
+
+class AgentRegistry:
+    """
+    Agent discovery backed by Redis. The `registered_agents` set lists agent
+    names, `agent:<name>` hashes carry their metadata (task stream, runtime,
+    ...), and every registration is announced on the `registry:events` Pub/Sub
+    channel so listeners pick up new agents without scanning the keyspace.
+    """
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.logger = logging.getLogger("AgentRegistry")
+
+    @staticmethod
+    def queue_registration(pipe, agent_name: str, metadata: dict):
+        """
+        Queues the registration commands on a (sync or asyncio) pipeline, so
+        both agent runtimes register in a single round trip.
+        """
+        pipe.sadd(REGISTRY_KEY, agent_name)
+        pipe.hset(f"{AGENT_METADATA_PREFIX}{agent_name}", mapping={**metadata, "registered_at": time.time()})
+        pipe.publish(REGISTRY_CHANNEL, agent_name)
+
+    def register(self, agent_name: str, metadata: dict):
+        pipe = self.redis_client.pipeline(transaction=False)
+        self.queue_registration(pipe, agent_name, metadata)
+        pipe.execute()
+
+    def agent_names(self) -> set:
+        return set(self.redis_client.smembers(REGISTRY_KEY))
+
+    def agents(self) -> dict:
+        """
+        Returns {agent_name: metadata} for every registered agent.
+        """
+        names = sorted(self.agent_names())
+        pipe = self.redis_client.pipeline(transaction=False)
+        for name in names:
+            pipe.hgetall(f"{AGENT_METADATA_PREFIX}{name}")
+        return dict(zip(names, pipe.execute()))
+
+    def subscribe(self):
+        """
+        Returns a Pub/Sub object subscribed to registration events. Poll it with
+        `get_message(timeout=...)`; the message data is the agent name.
+        """
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(REGISTRY_CHANNEL)
+        return pubsub
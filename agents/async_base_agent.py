@@ -0,0 +1,249 @@
+# /agentic-ai-system/agents/async_base_agent.py
+
+import os
+import socket
+import time
+import uuid
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from agents.task_outcome import read_task_async, result_entry, error_entry
+from codec import decode_task
+from agent_registry import AgentRegistry
+from blob_store import AsyncBlobStore
+from reclaim import AsyncPendingReclaimer
+from metrics import observe_task, start_metrics_server
+from scheduling import WeightedRoundRobin, priority_streams, split_reply
+from streaming import chunk_stream, collect_chunks_async, combine_chunks, is_stream_ref, queue_end, stream_source
+from redis_client import get_async_redis_client
+
+class AsyncBaseAgent(ABC):
+    """
+    asyncio counterpart of BaseAgent. It consumes the same task stream with the
+    same consumer group and publishes to the same result/error streams, so sync
+    and async workers of one agent type are interchangeable.
+
+    A single event loop keeps up to `concurrency` tasks in flight (bounded by a
+    semaphore), which suits agents whose work is dominated by network I/O such
+    as HTTP or LLM calls. Defaults to the AGENT_ASYNC_CONCURRENCY environment
+    variable. Priority streams are consumed with the same weighted round robin
+    as BaseAgent.
+
+    Streaming edges are supported without incremental processing: a
+    `stream_from:` input is awaited until its producer finished, and a task
+    whose output is streamed publishes its whole result as one chunk.
+
+    Like BaseAgent, the agent periodically takes over tasks stranded in the
+    group's pending list and reports dead-lettered tasks as errors.
+    """
+    def __init__(self, agent_name: str, task_stream: str, batch_size: int = None, concurrency: int = None):
+        self.agent_name = agent_name
+        self.task_stream = task_stream
+        self.task_streams = priority_streams(task_stream)
+        self.scheduler = WeightedRoundRobin()
+        self.result_stream_prefix = "results:"
+        self.error_stream_prefix = "errors:"
+        self.concurrency = concurrency or int(os.getenv("AGENT_ASYNC_CONCURRENCY", 100))
+        self.batch_size = batch_size or int(os.getenv("AGENT_BATCH_SIZE", min(self.concurrency, 50)))
+        self.consumer_name = f"{agent_name}-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.logger = logging.getLogger(self.agent_name)
+        self.redis_client = None
+        self._stopping = False
+
+    async def _register_agent(self):
+        """
+        Registers the agent's capabilities in a Redis Set for discovery,
+        together with its metadata, and announces it to listening orchestrators.
+        """
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            AgentRegistry.queue_registration(pipe, self.agent_name, self._registration_metadata())
+            await pipe.execute()
+        self.logger.info(f"Agent {self.agent_name} registered successfully.")
+
+    def _registration_metadata(self) -> dict:
+        return {
+            "task_stream": self.task_stream,
+            "result_stream_prefix": self.result_stream_prefix,
+            "error_stream_prefix": self.error_stream_prefix,
+            "runtime": "async",
+        }
+
+    @abstractmethod
+    async def _perform_task(self, task_data: dict) -> dict:
+        """
+        The core logic of the agent. Must be implemented by concrete agent
+        classes and must not block the event loop.
+        """
+        pass
+
+    async def _resolve_inputs(self, task_data: dict, keepalive=None) -> dict:
+        # `keepalive` keeps the task's message from looking stranded while it waits
+        for key in [key for key, value in task_data.items() if is_stream_ref(value)]:
+            chunks = await collect_chunks_async(self.redis_client, task_data['job_id'], stream_source(task_data[key]),
+                                                keepalive=keepalive)
+            task_data[key] = combine_chunks(chunks)
+        return task_data
+
+    async def _process_message(self, semaphore, message_id, fields, received_at: float = None, source: str = None):
+        """
+        Runs a single task, then publishes its outcome and acknowledges the
+        message (read from the task stream `source`) in one pipelined round
+        trip. Releases the semaphore slot that was acquired for it.
+        """
+        try:
+            task_data = fields
+            result, error = None, None
+            timing = {'received_at': received_at, 'started_at': time.time()}
+            try:
+                task_data = await read_task_async(fields, self.blobs)
+                self.logger.info(f"Received task {task_data.get('task_id')} ({message_id}): {task_data}")
+                keepalive = self.reclaimer.keepalive(source or self.task_stream, [message_id])
+                result = await self._perform_task(await self._resolve_inputs(task_data, keepalive))
+                timing['completed_at'] = time.time()
+                observe_task(self.agent_name, task_data, timing['started_at'], timing['completed_at'], "completed")
+                stream, entry = result_entry(self, task_data, result, timing)
+                entry['result'] = await self.blobs.offload(entry['result'])
+                self.logger.info(f"Task {task_data['task_id']} ({message_id}) completed successfully.")
+            except Exception as e:
+                error = e
+                timing['completed_at'] = time.time()
+                observe_task(self.agent_name, task_data, timing['started_at'], timing['completed_at'], "failed")
+                self.logger.error(f"Error processing task {message_id}: {e}", exc_info=True)
+                stream, entry = error_entry(self, task_data, e, timing)
+
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                if task_data.get('stream_output'):
+                    queue_end(pipe, chunk_stream(task_data['job_id'], task_data['task_id']), result=result, error=error)
+                pipe.xadd(stream, entry)
+                pipe.xack(source or self.task_stream, self.agent_name, message_id)
+                await pipe.execute()
+        except Exception as e:
+            self.logger.error(f"Could not publish outcome of task {message_id}: {e}", exc_info=True)
+        finally:
+            semaphore.release()
+
+    async def _read_batch(self):
+        """
+        Async counterpart of BaseAgent._read_batch; returns (messages, sources).
+        """
+        plan = self.scheduler.plan_read(self.task_streams, self.batch_size)
+        reads = plan.initial_reads()
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for _, stream, count in reads:
+                pipe.xreadgroup(self.agent_name, self.consumer_name, {stream: '>'}, count=count)
+            replies = await pipe.execute()
+        for (priority, _, _), reply in zip(reads, replies):
+            plan.add(priority, reply)
+        for priority, stream, count in plan.top_ups():
+            plan.add(priority, await self.redis_client.xreadgroup(self.agent_name, self.consumer_name, {stream: '>'}, count=count))
+
+        if plan.empty:
+            return split_reply(await self.redis_client.xreadgroup(
+                groupname=self.agent_name,
+                consumername=self.consumer_name,
+                streams={stream: '>' for stream in self.task_streams.values()},
+                count=1,
+                block=1000
+            ))
+        return plan.batch()
+
+    async def _reclaim(self, semaphore, in_flight):
+        """
+        Takes over tasks stranded in the group's pending list (e.g. by a crashed
+        worker) and schedules them like freshly read tasks, in rounds of
+        `batch_size` until nothing is left to take over. Tasks that exceeded
+        the delivery limit were dead-lettered; they are reported as errors so
+        their job fails instead of hanging.
+        """
+        for stream in self.task_streams.values():
+            while not self._stopping:
+                claimed, dead = await self.reclaimer.reclaim(stream, count=self.batch_size)
+                if not claimed and not dead:
+                    break
+                await self._schedule(semaphore, in_flight, claimed, [stream] * len(claimed))
+                if dead:
+                    await self._report_dead(dead)
+
+    async def _report_dead(self, dead):
+        """
+        Publishes an error entry (and closes the chunk stream) for every
+        dead-lettered task; the messages themselves are already acknowledged.
+        """
+        error = RuntimeError(f"Task exceeded {self.reclaimer.max_deliveries} deliveries and was dead-lettered.")
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for _, fields in dead:
+                task_data = decode_task(fields)
+                if task_data.get('stream_output'):
+                    # Unblocks consumers of its chunks
+                    queue_end(pipe, chunk_stream(task_data['job_id'], task_data['task_id']), error=error)
+                pipe.xadd(*error_entry(self, task_data, error))
+            await pipe.execute()
+
+    async def _schedule(self, semaphore, in_flight, batch, sources):
+        """
+        Starts a task for every message as soon as a concurrency slot is free.
+        """
+        received_at = time.time()
+        for (message_id, fields), source in zip(batch, sources):
+            # Blocks the reader (not the running tasks) while all slots are busy.
+            await semaphore.acquire()
+            task = asyncio.create_task(self._process_message(semaphore, message_id, fields, received_at, source))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+    async def run_async(self):
+        """
+        The main coroutine. Reads batches from the task streams and schedules each
+        task as soon as a concurrency slot is free.
+        """
+        self.redis_client = get_async_redis_client()
+        self.blobs = AsyncBlobStore()
+        self.reclaimer = AsyncPendingReclaimer(self.redis_client, self.agent_name, self.consumer_name)
+        await self._register_agent()
+        self.logger.info(
+            f"Async agent {self.agent_name} starting as consumer '{self.consumer_name}'. Listening to streams "
+            f"{list(self.task_streams.values())} (batch_size={self.batch_size}, concurrency={self.concurrency})."
+        )
+        for stream in self.task_streams.values():
+            try:
+                await self.redis_client.xgroup_create(stream, self.agent_name, id='0', mkstream=True)
+            except Exception as e:
+                self.logger.info(f"Consumer group '{self.agent_name}' on '{stream}' already exists or another error occurred: {e}")
+
+        start_metrics_server()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+        while not self._stopping:
+            try:
+                if self.reclaimer.due():
+                    await self._reclaim(semaphore, in_flight)
+
+                batch, sources = await self._read_batch()
+                await self._schedule(semaphore, in_flight, batch, sources)
+
+                # Yield once per round so finished tasks can publish even when the
+                # read returned immediately.
+                await asyncio.sleep(0)
+
+            except Exception as e:
+                self.logger.error(f"An unexpected error occurred in the agent loop: {e}", exc_info=True)
+                await asyncio.sleep(5)
+
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        # Leave the group after a clean stop unless this consumer still owns pending entries
+        await self.reclaimer.leave_group(self.task_streams.values())
+        await self.redis_client.aclose()
+        self.logger.info(f"Async agent {self.agent_name} consumer '{self.consumer_name}' stopped.")
+
+    def run(self):
+        """
+        Entry point matching BaseAgent.run: runs the agent on a fresh event loop.
+        """
+        asyncio.run(self.run_async())
+
+    def stop(self):
+        """
+        Asks the main loop to exit once the tasks currently in flight are done.
+        """
+        self._stopping = True
@@ -1,92 +1,505 @@
 
+import os
+import socket
+import threading
 import time
+import uuid
+import inspect
 import logging
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from agents.task_outcome import read_task, result_entry, error_entry
+from agent_registry import AgentRegistry
+from blob_store import BlobStore
+from task_cache import TaskResultCache
+from reclaim import PendingReclaimer
+from scheduling import WeightedRoundRobin, priority_streams, split_reply
+from streaming import CHUNK_MAX_RESTARTS, ChunkStreamRestarted, ChunkWriter, combine_chunks, is_stream_ref, iter_chunks, stream_source
+from metrics import REGISTRY, observe_task, cache_collector, stream_group_collector, start_metrics_server
 from redis_client import get_redis_client
 
 class BaseAgent(ABC):
     """
     Abstract Base Class for all agents. It provides the core functionality for
     listening to a Redis Stream, processing messages, and handling errors.
+
+    Tasks are read from the stream in batches of `batch_size` and executed on a
+    bounded thread pool of `concurrency` workers. Both default to the
+    AGENT_BATCH_SIZE / AGENT_CONCURRENCY environment variables. With a
+    `cache_ttl` (or AGENT_CACHE_TTL_<AGENT_NAME>), identical tasks are served
+    from a shared result cache; see `self.cache.stats()`.
+
+    The agent consumes one task stream per job priority class (see
+    scheduling.py). Each batch is split across the classes by weighted round
+    robin (TASK_PRIORITY_WEIGHTS); capacity a class leaves unused goes to the
+    others, highest priority first.
+
+    Agents backed by a batching model override `_perform_batch`. The runtime
+    then collects up to `micro_batch_size` tasks (AGENT_MICRO_BATCH_SIZE),
+    waiting at most `batch_linger` seconds (AGENT_BATCH_LINGER_MS) for a batch
+    to fill, and runs each micro-batch with one `_perform_batch` call on the
+    worker pool.
+
+    Agents can stream partial output: a `_perform_task` written as a generator
+    yields chunks (e.g. search hits or generated tokens), which are published
+    to `chunks:<job_id>:<task_id>` as they are produced when a downstream task
+    consumes the task through a `stream_from:` edge. The task's result is the
+    generator's return value, or {"content": <concatenated chunks>}. Consumers
+    get `stream_from:` inputs resolved to the complete value, unless they set
+    `consumes_streams` and read them incrementally with `iter_input`.
     """
-    def __init__(self, agent_name: str, task_stream: str):
+    # True for agents that read `stream_from:` inputs chunk by chunk with iter_input
+    consumes_streams = False
+
+    def __init__(self, agent_name: str, task_stream: str, batch_size: int = None, concurrency: int = None,
+                 cache_ttl: int = None, micro_batch_size: int = None, batch_linger: float = None):
         self.agent_name = agent_name
         self.task_stream = task_stream
+        self.task_streams = priority_streams(task_stream)
+        self.scheduler = WeightedRoundRobin()
         self.result_stream_prefix = "results:"
         self.error_stream_prefix = "errors:"
+        self.concurrency = concurrency or int(os.getenv("AGENT_CONCURRENCY", 1))
+        self.micro_batching = type(self)._perform_batch is not BaseAgent._perform_batch
+        self.micro_batch_size = micro_batch_size or int(os.getenv("AGENT_MICRO_BATCH_SIZE", 16))
+        if batch_linger is None:
+            batch_linger = float(os.getenv("AGENT_BATCH_LINGER_MS", 20)) / 1000
+        self.batch_linger = batch_linger
+        # Batching agents read enough tasks per round to give every worker a full micro-batch
+        default_batch = self.concurrency * self.micro_batch_size if self.micro_batching else self.concurrency
+        self.batch_size = batch_size or int(os.getenv("AGENT_BATCH_SIZE", default_batch))
+        # Every agent instance gets its own consumer name so that several processes
+        # (or several agents inside one process) can share the consumer group.
+        self.consumer_name = f"{agent_name}-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
         self.redis_client = get_redis_client()
         self.logger = logging.getLogger(self.agent_name)
+        self.registry = AgentRegistry(self.redis_client)
+        self.blobs = BlobStore()
+        # Opt-in memoization of results across jobs, e.g. AGENT_CACHE_TTL_WEB_SEARCH=3600
+        if cache_ttl is None:
+            cache_ttl = int(os.getenv(f"AGENT_CACHE_TTL_{agent_name.upper()}", 0))
+        self.cache = TaskResultCache(self.redis_client, agent_name, cache_ttl, blobs=self.blobs) if cache_ttl > 0 else None
+        self.reclaimer = PendingReclaimer(self.redis_client, self.agent_name, self.consumer_name)
+        self._stop_event = threading.Event()
+        # Keeps the messages of the running batch from looking stranded while a worker waits on a chunk stream
+        self._local = threading.local()
         self._register_agent()
 
     def _register_agent(self):
         """
-        Registers the agent's capabilities in a Redis Set for discovery.
+        Registers the agent's capabilities in a Redis Set for discovery,
+        together with its metadata, and announces it to listening orchestrators.
         """
-        self.redis_client.sadd("registered_agents", self.agent_name)
+        self.registry.register(self.agent_name, self._registration_metadata())
         self.logger.info(f"Agent {self.agent_name} registered successfully.")
 
+    def _registration_metadata(self) -> dict:
+        return {
+            "task_stream": self.task_stream,
+            "result_stream_prefix": self.result_stream_prefix,
+            "error_stream_prefix": self.error_stream_prefix,
+            "runtime": "sync",
+        }
+
     @abstractmethod
     def _perform_task(self, task_data: dict) -> dict:
         """
         The core logic of the agent. This method must be implemented by
-        concrete agent classes. It performs the actual work.
+        concrete agent classes. It performs the actual work, returning the
+        result or, as a generator, yielding it in chunks.
         """
         pass
 
-    def run(self):
+    def iter_input(self, task_data: dict, key: str):
+        """
+        Yields a task input chunk by chunk: the chunks of the producing task
+        for a `stream_from:` input, blocking until each one is written, or the
+        whole value as a single chunk otherwise.
+        """
+        value = task_data.get(key)
+        if is_stream_ref(value):
+            yield from iter_chunks(self.redis_client, task_data['job_id'], stream_source(value),
+                                   keepalive=getattr(self._local, 'keepalive', None))
+        elif value is not None:
+            yield value
+
+    def _resolve_inputs(self, task_data: dict) -> dict:
+        # Waits for the complete output of every streamed input
+        if task_data.get('stream_input') and not self.consumes_streams:
+            for key in [key for key, value in task_data.items() if is_stream_ref(value)]:
+                task_data[key] = combine_chunks(list(self.iter_input(task_data, key)))
+        return task_data
+
+    def _drain(self, chunks, writer) -> dict:
+        """
+        Runs a generator `_perform_task` to completion, publishing its chunks.
+        """
+        collected = []
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as stop:
+                return stop.value if stop.value is not None else {"content": combine_chunks(collected)}
+            collected.append(chunk)
+            if writer is not None:
+                writer.write(chunk)
+
+    def _chunk_writer(self, task_data: dict):
+        if not task_data.get('stream_output'):
+            return None
+        return ChunkWriter(self.redis_client, task_data['job_id'], task_data['task_id'],
+                           keepalive=getattr(self._local, 'keepalive', None))
+
+    def _compute(self, task_data: dict):
         """
-        The main loop for the agent. It listens to its designated task stream
-        and processes messages one by one.
+        Produces the result of one task through the cache (if any), streaming
+        its chunks to consumers and closing its chunk stream on success or
+        failure. Tasks with streamed inputs bypass the cache; they start over,
+        as a new attempt of their own output, when a producer is retried while
+        they read its chunks, up to CHUNK_MAX_RESTARTS times with exponential
+        backoff before the task fails.
         """
-        self.logger.info(f"Agent {self.agent_name} starting. Listening to stream '{self.task_stream}'.")
+        writer = self._chunk_writer(task_data)
+
+        def run(data):
+            result = self._perform_task(self._resolve_inputs(data))
+            if inspect.isgenerator(result):
+                result = self._drain(result, writer)
+            return result
+
         try:
-            self.redis_client.xgroup_create(self.task_stream, self.agent_name, id='0', mkstream=True)
+            if self.cache is not None and not task_data.get('stream_input'):
+                result = self.cache.get_or_compute(task_data, run)
+            else:
+                restarts = 0
+                while True:
+                    try:
+                        result = run(task_data)
+                        break
+                    except ChunkStreamRestarted as e:
+                        if restarts >= CHUNK_MAX_RESTARTS:
+                            raise
+                        restarts += 1
+                        self.logger.warning(f"Restarting task {task_data.get('task_id')} ({restarts}/{CHUNK_MAX_RESTARTS}): {e}")
+                        time.sleep(min(2 ** (restarts - 1), 30))
+                        if writer is not None:
+                            writer.restart()
         except Exception as e:
-            self.logger.info(f"Consumer group '{self.agent_name}' already exists or another error occurred: {e}")
+            if writer is not None:
+                writer.close(error=e)
+            raise
+        if writer is not None:
+            writer.close(result)
+        return result
 
-        while True:
+    def _perform_batch(self, tasks: list) -> list:
+        """
+        Optional batched counterpart of `_perform_task` for agents whose backend
+        is cheaper per item in batches (e.g. model inference). Returns one entry
+        per task, in order: the result, or an Exception instance for an item
+        that failed. If the call itself raises, the tasks are retried one at a
+        time so a single bad input fails only its own task.
+        """
+        raise NotImplementedError
+
+    def _run_batch(self, tasks: list) -> list:
+        try:
+            results = list(self._perform_batch(tasks))
+            if len(results) != len(tasks):
+                raise ValueError(f"_perform_batch returned {len(results)} results for {len(tasks)} tasks.")
+            return results
+        except Exception as e:
+            if len(tasks) == 1:
+                return [e]
+            self.logger.warning(f"Batch of {len(tasks)} tasks failed ({e}); retrying them one at a time.")
+            return [self._run_batch([task_data])[0] for task_data in tasks]
+
+    def _completed(self, message_id, task_data, result, timing):
+        observe_task(self.agent_name, task_data, timing['started_at'], timing['completed_at'], "completed")
+        self.logger.info(f"Task {task_data['task_id']} ({message_id}) completed successfully.")
+        stream, entry = result_entry(self, task_data, result, timing)
+        # Large results are stored once as a blob; the stream carries a reference
+        entry['result'] = self.blobs.offload(entry['result'])
+        return message_id, stream, entry
+
+    def _failed(self, message_id, task_data, error, timing):
+        observe_task(self.agent_name, task_data, timing['started_at'], timing['completed_at'], "failed")
+        self.logger.error(f"Error processing task {message_id}: {error}", exc_info=error)
+        return (message_id, *error_entry(self, task_data, error, timing))
+
+    def _process_batch(self, messages, received_at: float = None):
+        """
+        Runs a micro-batch with one `_perform_batch` call (cache hits excluded)
+        and builds one outcome per message, like `_process_message`. Executed on
+        the worker pool.
+        """
+        timing = {'received_at': received_at, 'started_at': time.time()}
+        outcomes = [None] * len(messages)
+        tasks = []
+        for index, (message_id, fields) in enumerate(messages):
             try:
-                messages = self.redis_client.xreadgroup(
-                    groupname=self.agent_name,
-                    consumername=f"{self.agent_name}-consumer",
-                    streams={self.task_stream: '>'},
-                    count=1,
-                    block=1000
-                )
+                tasks.append((index, message_id, read_task(fields, self.blobs)))
+            except Exception as e:
+                timing['completed_at'] = time.time()
+                outcomes[index] = self._failed(message_id, fields, e, timing)
+
+        if tasks:
+            self.logger.info(f"Running a batch of {len(tasks)} tasks.")
+            task_data = [data for _, _, data in tasks]
+            try:
+                if self.cache is not None:
+                    results = self.cache.get_or_compute_many(task_data, self._run_batch)
+                else:
+                    results = self._run_batch(task_data)
+            except Exception as e:
+                results = [e] * len(tasks)
+            timing['completed_at'] = time.time()
+            for (index, message_id, data), result in zip(tasks, results):
+                writer = self._chunk_writer(data)
+                if writer is not None:
+                    # Batched tasks publish their whole result as one chunk
+                    try:
+                        if isinstance(result, Exception):
+                            writer.close(error=result)
+                        else:
+                            writer.close(result)
+                    except Exception as e:
+                        self.logger.warning(f"Could not close the chunk stream of task {data.get('task_id')}: {e}")
+                if isinstance(result, Exception):
+                    outcomes[index] = self._failed(message_id, data, result, timing)
+                else:
+                    try:
+                        outcomes[index] = self._completed(message_id, data, result, timing)
+                    except Exception as e:
+                        outcomes[index] = self._failed(message_id, data, e, timing)
+        return outcomes
+
+    def _process_message(self, message, received_at: float = None, keepalive=None):
+        """
+        Runs a single task and builds the stream entry describing its outcome.
+        Executed on the worker pool; returns (message_id, stream, fields).
+        `keepalive` is called while the task waits for streamed inputs.
+        """
+        message_id, fields = message
+        task_data = fields
+        timing = {'received_at': received_at, 'started_at': time.time()}
+        self._local.keepalive = keepalive
+
+        try:
+            task_data = read_task(fields, self.blobs)
+            self.logger.info(f"Received task {task_data.get('task_id')} ({message_id}): {task_data}")
+            result = self._compute(task_data)
+            timing['completed_at'] = time.time()
+            return self._completed(message_id, task_data, result, timing)
 
-                if not messages:
-                    continue
+        except Exception as e:
+            timing['completed_at'] = time.time()
+            return self._failed(message_id, task_data, e, timing)
+        finally:
+            self._local.keepalive = None
+
+    def _flush(self, outcomes, sources):
+        """
+        Publishes the results of a batch and acknowledges its messages in a
+        single pipelined round trip. `sources` lists the task stream each
+        message was read from.
+        """
+        if not outcomes:
+            return
+        acks = {}
+        pipe = self.redis_client.pipeline(transaction=False)
+        for (message_id, stream, fields), source in zip(outcomes, sources):
+            pipe.xadd(stream, fields)
+            acks.setdefault(source, []).append(message_id)
+        for source, message_ids in acks.items():
+            pipe.xack(source, self.agent_name, *message_ids)
+        pipe.execute()
+
+    def _read_batch(self, limit: int = None, block_ms: int = 1000):
+        """
+        Reads up to `limit` (default `batch_size`) tasks across the priority
+        streams as planned by scheduling.PriorityRead: one pipelined
+        non-blocking XREADGROUP per class with its weighted quota, top-ups from
+        the classes that still have work when others came back short, and a
+        blocking read on all streams (up to `block_ms`) when everything is
+        empty.
+
+        Returns:
+            (messages, sources) in priority order.
+        """
+        plan = self.scheduler.plan_read(self.task_streams, limit or self.batch_size)
+        reads = plan.initial_reads()
+        pipe = self.redis_client.pipeline(transaction=False)
+        for _, stream, count in reads:
+            pipe.xreadgroup(self.agent_name, self.consumer_name, {stream: '>'}, count=count)
+        for (priority, _, _), reply in zip(reads, pipe.execute()):
+            plan.add(priority, reply)
+        for priority, stream, count in plan.top_ups():
+            plan.add(priority, self.redis_client.xreadgroup(self.agent_name, self.consumer_name, {stream: '>'}, count=count))
+
+        if plan.empty:
+            # Nothing queued in any class: wait for the first task to arrive
+            return split_reply(self.redis_client.xreadgroup(
+                groupname=self.agent_name,
+                consumername=self.consumer_name,
+                streams={stream: '>' for stream in self.task_streams.values()},
+                count=1,
+                block=block_ms
+            ))
+        return plan.batch()
+
+    def _read_lingering(self):
+        """
+        Reads a batch and, for batching agents, keeps topping it up until it is
+        full or `batch_linger` seconds passed since the first task arrived.
+        """
+        batch, sources = self._read_batch()
+        if not batch or not self.micro_batching:
+            return batch, sources
+        deadline = time.monotonic() + self.batch_linger
+        while len(batch) < self.batch_size:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            more, more_sources = self._read_batch(limit=self.batch_size - len(batch), block_ms=remaining_ms)
+            batch += more
+            sources += more_sources
+        return batch, sources
+
+    def _keepalive(self, batch, sources):
+        """
+        One callable refreshing the idle time of every message in the batch.
+        Its outcomes are acknowledged together, so while a task waits for a
+        producer the finished ones stay pending too.
+        """
+        message_ids = {}
+        for (message_id, _), source in zip(batch, sources):
+            message_ids.setdefault(source, []).append(message_id)
+        refreshers = [self.reclaimer.keepalive(source, ids) for source, ids in message_ids.items()]
 
-                stream, msg_list = messages[0]
-                message_id, task_data = msg_list[0]
+        def keepalive():
+            for refresh in refreshers:
+                refresh()
+        return keepalive
 
-                self.logger.info(f"Received task {task_data.get('task_id')} ({message_id}): {task_data}")
+    def _execute(self, executor, batch, received_at, sources):
+        """
+        Runs a batch of messages on the worker pool: one task per worker call,
+        or micro-batches of up to `micro_batch_size` for batching agents.
+        Tasks with streamed inputs always run on their own and are queued
+        last, since they may be waiting for producers in the same batch. While
+        tasks wait for streamed inputs or stream their output, they keep the
+        batch's messages from being reclaimed.
+        Returns the outcomes in message order.
+        """
+        streamed = [index for index, (_, fields) in enumerate(batch) if fields.get('stream_input')]
+        streaming = streamed or any(fields.get('stream_output') for _, fields in batch)
+        keepalive = self._keepalive(batch, sources) if streaming else None
+        others = [index for index, (_, fields) in enumerate(batch) if not fields.get('stream_input')]
+        batches = []
+        if self.micro_batching:
+            for start in range(0, len(others), self.micro_batch_size):
+                group = others[start:start + self.micro_batch_size]
+                batches.append((group, executor.submit(self._process_batch, [batch[index] for index in group], received_at)))
+        else:
+            streamed = others + streamed
+        singles = [(index, executor.submit(self._process_message, batch[index], received_at, keepalive)) for index in streamed]
+
+        outcomes = [None] * len(batch)
+        for group, future in batches:
+            for index, outcome in zip(group, future.result()):
+                outcomes[index] = outcome
+        for index, future in singles:
+            outcomes[index] = future.result()
+        return outcomes
+
+    def _reclaim(self, executor):
+        """
+        Takes over tasks stranded in the group's pending list (e.g. by a crashed
+        worker) and runs them. Tasks that exceeded the delivery limit were
+        dead-lettered; they are reported as errors so their job fails instead
+        of hanging.
 
+        Tasks are claimed in rounds of `batch_size`, each run before the next
+        is claimed, so claimed tasks do not sit idle long enough to be claimed
+        again by other workers; rounds repeat until the pending list has
+        nothing left to take over.
+        """
+        for stream in self.task_streams.values():
+            while not self._stop_event.is_set():
+                claimed, dead = self.reclaimer.reclaim(stream, count=self.batch_size)
+                if not claimed and not dead:
+                    break
+                self._recover(executor, stream, claimed, dead)
+
+    def _recover(self, executor, stream, claimed, dead):
+        """
+        Runs the tasks of one reclaim round and reports its dead-lettered ones.
+        """
+        if claimed:
+            sources = [stream] * len(claimed)
+            self._flush(self._execute(executor, claimed, time.time(), sources), sources)
+        if dead:
+            error = RuntimeError(f"Task exceeded {self.reclaimer.max_deliveries} deliveries and was dead-lettered.")
+            outcomes = []
+            for message_id, fields in dead:
+                task_data = read_task(fields, self.blobs)
+                writer = self._chunk_writer(task_data)
+                if writer is not None:
+                    writer.close(error=error)  # unblocks consumers of its chunks
+                outcomes.append((message_id, *error_entry(self, task_data, error)))
+            self._flush(outcomes, [stream] * len(outcomes))
+
+    def run(self):
+        """
+        The main loop for the agent. It listens to its designated task streams,
+        reads up to `batch_size` messages at a time and processes them on a
+        pool of `concurrency` worker threads.
+        """
+        self.logger.info(
+            f"Agent {self.agent_name} starting as consumer '{self.consumer_name}'. Listening to streams "
+            f"{list(self.task_streams.values())} (batch_size={self.batch_size}, concurrency={self.concurrency}"
+            + (f", micro_batch_size={self.micro_batch_size}, linger={self.batch_linger}s)." if self.micro_batching else ").")
+        )
+        for stream in self.task_streams.values():
+            try:
+                self.redis_client.xgroup_create(stream, self.agent_name, id='0', mkstream=True)
+            except Exception as e:
+                self.logger.info(f"Consumer group '{self.agent_name}' on '{stream}' already exists or another error occurred: {e}")
+
+        REGISTRY.add_collector(stream_group_collector(self.redis_client, lambda: list(self.task_streams.values())))
+        if self.cache is not None:
+            REGISTRY.add_collector(cache_collector(self.agent_name, self.cache))
+        start_metrics_server()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=self.agent_name) as executor:
+            while not self._stop_event.is_set():
                 try:
-                    result = self._perform_task(task_data)
+                    if self.reclaimer.due():
+                        self._reclaim(executor)
+
+                    batch, sources = self._read_lingering()
+                    if not batch:
+                        continue
 
-                    result_stream = f"{self.result_stream_prefix}{self.agent_name}"
-                    # *** FIXED: Pass the specific task_id from the plan in the result message ***
-                    self.redis_client.xadd(result_stream, {
-                        'job_id': task_data['job_id'],
-                        'task_id': task_data['task_id'],
-                        'result': str(result),
-                    })
-                    self.logger.info(f"Task {task_data['task_id']} ({message_id}) completed successfully.")
+                    self._flush(self._execute(executor, batch, time.time(), sources), sources)
 
                 except Exception as e:
-                    self.logger.error(f"Error processing task {message_id}: {e}", exc_info=True)
-                    error_stream = f"{self.error_stream_prefix}{self.agent_name}"
-                    # *** FIXED: Pass the task_id in the error message as well ***
-                    self.redis_client.xadd(error_stream, {
-                        'job_id': task_data['job_id'],
-                        'task_id': task_data.get('task_id', 'unknown'),
-                        'error': str(e),
-                        'original_task': str(task_data)
-                    })
-
-                self.redis_client.xack(self.task_stream, self.agent_name, message_id)
+                    self.logger.error(f"An unexpected error occurred in the agent loop: {e}", exc_info=True)
+                    time.sleep(5)
+        self._leave_group()
+        self.logger.info(f"Agent {self.agent_name} consumer '{self.consumer_name}' stopped.")
 
-            except Exception as e:
-                self.logger.error(f"An unexpected error occurred in the agent loop: {e}", exc_info=True)
-                time.sleep(5)
\ No newline at end of file
+    def _leave_group(self):
+        """
+        Removes this consumer from the group after a clean stop, so scaled-down
+        workers do not pile up in the group. A consumer that still owns pending
+        entries is kept; live consumers reclaim those entries.
+        """
+        self.reclaimer.leave_group(self.task_streams.values())
+
+    def stop(self):
+        """
+        Asks the main loop to exit once the batch currently in flight is flushed.
+        """
+        self._stop_event.set()
@@ -1,51 +1,152 @@
 # /agentic-ai-system/agents/planner_agent.py
 
-import json
 import logging
+import codec
 from redis_client import get_redis_client
 from utils import generate_job_id
+from plan_dag import CompiledPlan
+from blob_store import BlobStore
+from scheduling import DEFAULT_PRIORITY, DEFAULT_TENANT, PRIORITY_CLASSES
+from plan_cache import PLAN_CACHE_SIZE, GoalPlanCache, PlanTemplateStore, compile_template, render_template
 
 class PlannerAgent:
     """
     Creates a plan to achieve a high-level goal. In a real system, this
     would involve an LLM call to generate a structured plan (e.g., JSON).
+
+    Generated plans are compiled into a template (the task graph, written to
+    Redis once) plus per-job params (the task details). Repeated goals are
+    served from a goal -> (template, params) cache without calling the LLM.
+
+    Goals that are only similar to a cached goal (PLAN_CACHE_SIMILARITY) can
+    reuse its template when a `param_filler(goal, template_tasks, params)` is
+    given that returns the params for the new goal, e.g. by asking a small
+    model to extract them; `params` are those of the similar goal, as an
+    example. Without a filler, similar goals are planned from scratch.
     """
-    def __init__(self):
+    def __init__(self, plan_cache=None, param_filler=None):
         self.logger = logging.getLogger("PlannerAgent")
         self.redis_client = get_redis_client()
+        self.blobs = BlobStore()
+        self.templates = PlanTemplateStore(self.redis_client)
+        # PLAN_CACHE_SIZE=0 disables the goal cache; templates are always shared
+        if plan_cache is None and PLAN_CACHE_SIZE > 0:
+            plan_cache = GoalPlanCache(self.redis_client)
+        self.plan_cache = plan_cache
+        self.param_filler = param_filler
+        if plan_cache is not None and plan_cache.similarity > 0 and param_filler is None:
+            self.logger.warning("PLAN_CACHE_SIMILARITY is set but no param_filler was given; similar goals are not reused.")
 
-    def create_plan(self, goal: str) -> dict:
+    def _generate_plan(self, goal: str) -> list:
         """
-        Generates a job and a plan. Mocks an LLM call.
+        Mocks the LLM call that turns a goal into plan tasks.
         """
-        self.logger.info(f"Creating a plan for the goal: '{goal}'")
-        job_id = generate_job_id()
-
         # Mocked LLM response: A JSON plan based on the goal.
         # This defines tasks, the agent responsible, and dependencies.
         # An empty dependency list means the task can start immediately.
+        return [
+            {
+                "task_id": "task1",
+                "agent": "web_search",
+                "details": {"query": "Capital of France"},
+                "dependencies": []
+            },
+            {
+                "task_id": "task2",
+                "agent": "summarization",
+                # Data dependency: summarize the search hits as they are streamed
+                "details": {"text": "stream_from:task1"},
+                "dependencies": ["task1"]
+            }
+        ]
+
+    def plan_goal(self, goal: str, priority: str = DEFAULT_PRIORITY, tenant: str = DEFAULT_TENANT) -> tuple:
+        """
+        Generates a plan for `goal`, from the plan cache when possible, without
+        creating the job. The job's `priority` class selects the task streams
+        its tasks are queued on; `tenant` is the unit of admission control.
+
+        Returns:
+            (plan, fields) where `fields` is the `job:<id>` hash to store.
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority '{priority}'. Available: {PRIORITY_CLASSES}")
+        self.logger.info(f"Creating a plan for the goal: '{goal}'")
+
+        cached = None
+        if self.plan_cache is not None:
+            cached = self.plan_cache.lookup(goal, similar=self.param_filler is not None)
+        template_tasks = self.templates.get(cached[0]) if cached else None
+        if template_tasks is None:
+            template_tasks, params = compile_template(self._generate_plan(goal))
+            template_id = self.templates.put(template_tasks)
+            if self.plan_cache is not None:
+                self.plan_cache.store(goal, template_id, params)
+        else:
+            template_id, params, exact = cached
+            if not exact:
+                # Only plans generated for the goal itself are cached under it
+                params = self.param_filler(goal, template_tasks, params)
+
         plan = {
-            "job_id": job_id,
+            "job_id": generate_job_id(),
             "goal": goal,
-            "tasks": [
-                {
-                    "task_id": "task1",
-                    "agent": "web_search",
-                    "details": {"query": "Capital of France"},
-                    "dependencies": []
-                },
-                {
-                    "task_id": "task2",
-                    "agent": "summarization",
-                    "details": {"text": "result_from:task1"}, # Placeholder for data dependency
-                    "dependencies": ["task1"]
-                }
-            ]
+            "priority": priority,
+            "tenant": tenant,
+            "template_id": template_id,
+            "tasks": render_template(template_tasks, params),
         }
-        
-        # Store the plan in Redis so the orchestrator can access it
-        self.redis_client.hset(f"job:{job_id}", "plan", json.dumps(plan))
-        self.redis_client.hset(f"job:{job_id}", "status", "pending")
-        
-        self.logger.info(f"Plan created for job {job_id}.")
-        return plan
\ No newline at end of file
+        return plan, self._job_fields(plan, template_id, params)
+
+    def prepare_plan(self, plan: dict) -> tuple:
+        """
+        Prepares an externally built plan (a dict with `tasks` and optionally
+        `job_id`, `goal`, `priority` and `tenant`) for submission. Raises
+        ValueError for a plan that cannot be compiled.
+
+        Returns:
+            (plan, fields) like plan_goal.
+        """
+        plan = dict(plan)
+        plan.setdefault("job_id", generate_job_id())
+        plan.setdefault("goal", "N/A")
+        plan["priority"] = plan.get("priority") or DEFAULT_PRIORITY
+        plan["tenant"] = plan.get("tenant") or DEFAULT_TENANT
+        if plan["priority"] not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority '{plan['priority']}'. Available: {PRIORITY_CLASSES}")
+        # Rejects invalid plans (cycles, unknown dependencies, ...) before they are submitted
+        CompiledPlan(plan)
+        template_tasks, params = compile_template(plan["tasks"])
+        plan["template_id"] = self.templates.put(template_tasks)
+        return plan, self._job_fields(plan, plan["template_id"], params)
+
+    def _job_fields(self, plan: dict, template_id: str, params: dict) -> dict:
+        # Store only the template id and this job's params; the orchestrator
+        # renders the plan from the shared template
+        params_encoding, params_data = codec.encode(params)
+        return {
+            "goal": plan["goal"],
+            "priority": plan["priority"],
+            "tenant": plan["tenant"],
+            "plan_template": template_id,
+            "plan_params": self.blobs.offload(params_data),
+            "plan_encoding": params_encoding,
+            "status": "pending",
+        }
+
+    def create_plan(self, goal: str, priority: str = DEFAULT_PRIORITY, tenant: str = DEFAULT_TENANT) -> dict:
+        """
+        Generates a job and a plan and stores the job. Submit it with
+        JobClient (job_client.py), or start it in-process with
+        Orchestrator.start_new_job.
+        """
+        plan, fields = self.plan_goal(goal, priority=priority, tenant=tenant)
+        self.redis_client.hset(f"job:{plan['job_id']}", mapping=fields)
+        self.logger.info(f"Plan created for job {plan['job_id']} from template {plan['template_id'][:12]}.")
+        return plan
+
+    def stats(self) -> dict:
+        stats = self.templates.stats()
+        if self.plan_cache is not None:
+            stats.update(self.plan_cache.stats())
+        return stats
@@ -1,30 +1,110 @@
 # /agentic-ai-system/agents/summarization_agent.py
 
 from agents.base_agent import BaseAgent
+from agents.async_base_agent import AsyncBaseAgent
+import re
+import asyncio
 import time
 import random
+from collections import Counter
+from streaming import is_stream_ref
+
+class LocalSummarizer:
+    """
+    CPU-only stand-in for a batched summarization model. It is extractive:
+    each text is summarized by its sentence whose words are most frequent in
+    the text. Like real inference, every call pays a fixed overhead
+    (`call_latency`, a forward pass or API round trip) plus a small cost per
+    item, so batching amortizes the overhead across the batch.
+    """
+    def __init__(self, call_latency=(2, 4), item_latency: float = 0.05):
+        self.call_latency = call_latency
+        self.item_latency = item_latency
+
+    @staticmethod
+    def _summarize(text: str) -> str:
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+        if not sentences:
+            return ""
+        frequencies = Counter(re.findall(r"\w+", text.lower()))
+        def score(sentence):
+            words = re.findall(r"\w+", sentence.lower())
+            return sum(frequencies[word] for word in words) / (len(words) or 1)
+        return max(sentences, key=score)
+
+    def summarize_batch(self, texts: list) -> list:
+        time.sleep(random.uniform(*self.call_latency) + self.item_latency * len(texts))
+        return [self._summarize(text) for text in texts]
+
+    def summarize_stream(self, chunks) -> str:
+        """
+        Summarizes text that arrives in chunks. The fixed overhead of the call
+        is paid up front and each chunk is ingested as soon as it arrives
+        (`item_latency`, like incremental prefill), so both overlap with the
+        producer that is still writing the text.
+        """
+        time.sleep(random.uniform(*self.call_latency))
+        text = ""
+        for chunk in chunks:
+            time.sleep(self.item_latency)
+            text += str(chunk)
+        return self._summarize(text)
 
 class SummarizationAgent(BaseAgent):
     """
-    An agent that simulates summarizing a given piece of text.
+    An agent that simulates summarizing a given piece of text. Tasks are
+    micro-batched into one model call (see BaseAgent._perform_batch); text
+    streamed from an upstream task (`stream_from:`) is consumed as it arrives.
     """
-    def __init__(self):
-        super().__init__(agent_name="summarization", task_stream="tasks:summarization")
+    consumes_streams = True
+
+    def __init__(self, model=None, **kwargs):
+        super().__init__(agent_name="summarization", task_stream="tasks:summarization", **kwargs)
+        # In a real implementation this would be a batched LLM client or a local model
+        self.model = model or LocalSummarizer()
 
     def _perform_task(self, task_data: dict) -> dict:
+        if is_stream_ref(task_data.get('text')):
+            self.logger.info("Performing summarization of streamed text...")
+            summary = self.model.summarize_stream(self.iter_input(task_data, 'text'))
+            if not summary:
+                raise ValueError("Text not provided for summarization.")
+            return {"summary": f"Summary: {summary}"}
+        result = self._perform_batch([task_data])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _perform_batch(self, tasks: list) -> list:
+        results = [ValueError("Text not provided for summarization.") for _ in tasks]
+        valid = [index for index, task_data in enumerate(tasks) if task_data.get('text')]
+        if valid:
+            self.logger.info(f"Performing summarization of {len(valid)} texts...")
+            summaries = self.model.summarize_batch([str(tasks[index]['text']) for index in valid])
+            for index, summary in zip(valid, summaries):
+                results[index] = {"summary": f"Summary: {summary}"}
+        return results
+
+class AsyncSummarizationAgent(AsyncBaseAgent):
+    """
+    asyncio variant of SummarizationAgent. Shares its stream and consumer group.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(agent_name="summarization", task_stream="tasks:summarization", **kwargs)
+
+    async def _perform_task(self, task_data: dict) -> dict:
         text_to_summarize = task_data.get('text')
         if not text_to_summarize:
             raise ValueError("Text not provided for summarization.")
 
         self.logger.info("Performing summarization...")
-        # Simulate LLM processing time
-        time.sleep(random.uniform(2, 4))
-        
-        # In a real implementation, you would call an LLM API (e.g., OpenAI, Anthropic)
-        # with a prompt to summarize the text.
-        
+        # Simulate LLM processing time without blocking the event loop
+        await asyncio.sleep(random.uniform(2, 4))
+
+        # In a real implementation, you would await an async LLM client here.
+
         summary = f"Summary: The main point of the text is that Paris is the capital of France."
-        
+
         return {"summary": summary}
 
 if __name__ == '__main__':
@@ -0,0 +1,66 @@
+# /agentic-ai-system/agents/task_outcome.py
+
+from codec import ENCODING_FIELD, encode, decode_task
+from utils import shard_stream
+from blob_store import LazyTaskData
+
+# Helpers shared by BaseAgent and AsyncBaseAgent to decode incoming task
+# entries and to build the result/error entries they publish.
+
+def read_task(fields: dict, blobs) -> dict:
+    """
+    Decodes a task entry. Large detail values arrive as blob references and
+    are fetched lazily on first access.
+    """
+    return LazyTaskData(decode_task(fields), blobs)
+
+async def read_task_async(fields: dict, blobs) -> dict:
+    """
+    asyncio variant of `read_task`. Blob references cannot be fetched lazily
+    without blocking the event loop, so they are all resolved with one MGET,
+    including those inside list values.
+    """
+    task_data = decode_task(fields)
+    flat = [item for value in task_data.values() for item in (value if isinstance(value, list) else [value])]
+    resolved = iter(await blobs.resolve_many(flat))
+    return {
+        key: [next(resolved) for _ in value] if isinstance(value, list) else next(resolved)
+        for key, value in task_data.items()
+    }
+
+def _timing(task_data: dict, timing: dict) -> dict:
+    # Echoes the dispatch time and adds the agent-side timestamps (epoch seconds)
+    fields = {name: f"{value:.6f}" for name, value in (timing or {}).items() if value is not None}
+    if task_data.get('dispatched_at'):
+        fields['dispatched_at'] = task_data['dispatched_at']
+    return fields
+
+def result_entry(agent, task_data: dict, result, timing: dict = None) -> tuple:
+    """
+    Returns (stream, fields) for a successful task. `timing` holds the
+    received_at / started_at / completed_at timestamps of the task.
+    """
+    tag, data = encode(result)
+    # *** FIXED: Pass the specific task_id from the plan in the result message ***
+    return shard_stream(agent.result_stream_prefix, agent.agent_name, task_data.get('shard')), {
+        'job_id': task_data['job_id'],
+        'task_id': task_data['task_id'],
+        'result': data,
+        ENCODING_FIELD: tag,
+        **_timing(task_data, timing),
+    }
+
+def error_entry(agent, task_data: dict, error: Exception, timing: dict = None) -> tuple:
+    """
+    Returns (stream, fields) for a failed task, including the original task.
+    """
+    tag, data = encode(task_data)
+    # *** FIXED: Pass the task_id in the error message as well ***
+    return shard_stream(agent.error_stream_prefix, agent.agent_name, task_data.get('shard')), {
+        'job_id': task_data.get('job_id', 'unknown'),
+        'task_id': task_data.get('task_id', 'unknown'),
+        'error': str(error),
+        'original_task': data,
+        ENCODING_FIELD: tag,
+        **_timing(task_data, timing),
+    }
@@ -1,5 +1,7 @@
 
 from agents.base_agent import BaseAgent
+from agents.async_base_agent import AsyncBaseAgent
+import asyncio
 import time
 import random
 
@@ -7,23 +9,54 @@ class WebSearchAgent(BaseAgent):
     """
     An agent that simulates performing a web search for a given query.
     """
-    def __init__(self):
-        super().__init__(agent_name="web_search", task_stream="tasks:web_search")
+    def __init__(self, **kwargs):
+        super().__init__(agent_name="web_search", task_stream="tasks:web_search", **kwargs)
 
-    def _perform_task(self, task_data: dict) -> dict:
+    def _perform_task(self, task_data: dict):
         query = task_data.get('query')
         if not query:
             raise ValueError("Query not provided for web search.")
 
         self.logger.info(f"Performing web search for: '{query}'")
-        # Simulate network latency and work
-        time.sleep(random.uniform(1, 3))
-        
+
         # In a real implementation, you would use a library like `requests`
         # and `BeautifulSoup` or call a search API (e.g., Google, Bing, Serper).
-        
+
+        mock_hits = [
+            f"Search results for '{query}': ",
+            "The capital of France is Paris. ",
+            "Wikipedia also mentions Lyon and Marseille.",
+        ]
+        # Hits are yielded as they arrive, so tasks consuming this one through a
+        # `stream_from:` edge can start on the first hits. The task result is
+        # {"content": <all hits>}.
+        latency = random.uniform(1, 3)
+        for hit in mock_hits:
+            # Simulate network latency and work
+            time.sleep(latency / len(mock_hits))
+            yield hit
+
+class AsyncWebSearchAgent(AsyncBaseAgent):
+    """
+    asyncio variant of WebSearchAgent. Shares its stream and consumer group.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(agent_name="web_search", task_stream="tasks:web_search", **kwargs)
+
+    async def _perform_task(self, task_data: dict) -> dict:
+        query = task_data.get('query')
+        if not query:
+            raise ValueError("Query not provided for web search.")
+
+        self.logger.info(f"Performing web search for: '{query}'")
+        # Simulate network latency without blocking the event loop
+        await asyncio.sleep(random.uniform(1, 3))
+
+        # In a real implementation, you would use an async HTTP client such as
+        # `httpx.AsyncClient` or `aiohttp` here.
+
         mock_result = f"Search results for '{query}': The capital of France is Paris. Wikipedia also mentions Lyon and Marseille."
-        
+
         return {"content": mock_result}
 
 if __name__ == '__main__':
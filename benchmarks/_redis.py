@@ -0,0 +1,29 @@
+# /agentic-ai-system/benchmarks/_redis.py
+
+import redis_client
+from scheduling import priority_streams
+
+def use_fakeredis():
+    """
+    Points the `redis_client` factories (text, binary, sync and asyncio) at
+    one shared in-process fakeredis server. Must be called before the agent and
+    orchestrator modules are imported, since they bind the factories at import.
+    Requires `pip install fakeredis lupa`.
+    """
+    try:
+        import fakeredis
+    except ImportError as e:
+        raise SystemExit("--fake requires the 'fakeredis' package (pip install fakeredis lupa)") from e
+
+    server = fakeredis.FakeServer()
+    redis_client.get_redis_client = lambda: fakeredis.FakeRedis(server=server, decode_responses=True)
+    redis_client.get_async_redis_client = lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    redis_client.get_binary_redis_client = lambda: fakeredis.FakeRedis(server=server)
+    redis_client.get_async_binary_redis_client = lambda: fakeredis.FakeAsyncRedis(server=server)
+
+def flush_benchmark_keys(client, agent_names):
+    """
+    Removes the streams left behind by a previous benchmark run.
+    """
+    for name in agent_names:
+        client.delete(*priority_streams(f"tasks:{name}").values(), f"results:{name}", f"errors:{name}")
@@ -0,0 +1,67 @@
+# /agentic-ai-system/benchmarks/codec_benchmark.py
+"""
+Micro-benchmark of result serialization: the legacy `str(result)` +
+`robust_string_to_dict` path against the codecs in codec.py. No Redis needed.
+
+    python -m benchmarks.codec_benchmark --size 8192 --number 2000
+"""
+
+import argparse
+import json
+import logging
+import timeit
+
+import codec
+from utils import robust_string_to_dict
+
+def make_result(size: int) -> dict:
+    """
+    A web-search-like result: a few short fields plus `size` bytes of content
+    containing quotes, which the legacy repr path has to cope with.
+    """
+    sentence = "Paris is the capital of France; it's also known as the \"City of Light\". "
+    content = (sentence * (size // len(sentence) + 1))[:size]
+    return {
+        "content": content,
+        "links": [f"https://example.com/{i}" for i in range(10)],
+        "score": 0.93,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=8192, help="bytes of content per result")
+    parser.add_argument("--number", type=int, default=2000, help="iterations per case")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # The legacy parser logs on every call; keep the comparison about CPU time
+    logging.getLogger("utils").setLevel(logging.ERROR)
+
+    result = make_result(args.size)
+    legacy = str(result)
+    cases = [("legacy repr + robust_string_to_dict", lambda: str(result), lambda: robust_string_to_dict(legacy), len(legacy))]
+    for tag in codec.available_codecs():
+        _, data = codec.encode(result, tag)
+        cases.append((
+            tag,
+            lambda tag=tag: codec.encode(result, tag),
+            lambda tag=tag, data=data: codec.decode(data, tag),
+            len(data),
+        ))
+
+    rows = []
+    for name, encode_fn, decode_fn, size in cases:
+        encode_us = timeit.timeit(encode_fn, number=args.number) / args.number * 1e6
+        decode_us = timeit.timeit(decode_fn, number=args.number) / args.number * 1e6
+        rows.append({"codec": name, "bytes": size, "encode_us": round(encode_us, 2), "decode_us": round(decode_us, 2)})
+
+    print(f"{'codec':<38}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for r in rows:
+        print(f"{r['codec']:<38}{r['bytes']:>8}{r['encode_us']:>12}{r['decode_us']:>12}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"size": args.size, "number": args.number, "results": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# /agentic-ai-system/benchmarks/dag_benchmark.py
+"""
+End-to-end DAG throughput benchmark. Generates synthetic plans, drives them
+through the real Orchestrator and BaseAgent subclasses (with simulated task
+latency instead of real tools) and reports jobs/sec, orchestration overhead
+per task and end-to-end latency percentiles.
+
+    python -m benchmarks.dag_benchmark --shape chain --tasks 20 --jobs 50
+    python -m benchmarks.dag_benchmark --shape fanout --tasks 52 --latency exp:0.05 --fake
+    python -m benchmarks.dag_benchmark --shape random --tasks 100 --output bench.json
+    python -m benchmarks.dag_benchmark --shape chain --tasks 10 --latency const:0.5 --stream 5
+
+Latency distributions: const:S, uniform:A:B, exp:MEAN, lognormal:MU:SIGMA (seconds).
+Results saved with --output can be diffed between commits.
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import logging
+import threading
+import subprocess
+import uuid
+
+AGENT_NAMES = ["bench_search", "bench_summarize"]
+
+def latency_sampler(spec: str):
+    kind, *params = spec.split(":")
+    params = [float(p) for p in params]
+    if kind == "const":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(params[0], params[1])
+    raise SystemExit(f"Unknown latency distribution '{spec}'")
+
+def _task(task_id, index, dependencies, stream=False):
+    details = {"query": f"q{index}"}
+    if len(dependencies) > 1 and not stream:
+        # Fan-in: all upstream results, fetched in one round trip
+        details["text"] = {"fan_in": dependencies, "aggregate": "concat"}
+    elif dependencies:
+        details["text"] = f"{'stream_from' if stream else 'result_from'}:{dependencies[0]}"
+    return {
+        "task_id": task_id,
+        "agent": AGENT_NAMES[index % len(AGENT_NAMES)],
+        "details": details,
+        "dependencies": dependencies,
+    }
+
+def make_plan(shape: str, tasks: int, rng: random.Random, edge_prob: float = 0.1, stream: bool = False) -> dict:
+    """
+    Builds a synthetic plan with `tasks` tasks:
+      chain   t0 -> t1 -> ... -> tN
+      fanout  t0 -> (t1 .. tN-2 in parallel) -> tN-1
+      random  random DAG; each earlier task is a dependency with `edge_prob`
+    With `stream`, the edge carrying each task's input is a streaming edge.
+    """
+    ids = [f"t{i}" for i in range(tasks)]
+    if shape == "chain":
+        plan_tasks = [_task(ids[i], i, [ids[i - 1]] if i else [], stream) for i in range(tasks)]
+    elif shape == "fanout":
+        if tasks < 3:
+            raise SystemExit("--shape fanout needs at least 3 tasks")
+        plan_tasks = [_task(ids[0], 0, [], stream)]
+        plan_tasks += [_task(ids[i], i, [ids[0]], stream) for i in range(1, tasks - 1)]
+        plan_tasks.append(_task(ids[-1], tasks - 1, ids[1:-1], stream))
+    elif shape == "random":
+        plan_tasks = []
+        for i in range(tasks):
+            dependencies = [ids[j] for j in range(i) if rng.random() < edge_prob]
+            plan_tasks.append(_task(ids[i], i, dependencies, stream))
+    else:
+        raise SystemExit(f"Unknown shape '{shape}'")
+    return {"job_id": str(uuid.uuid4()), "goal": f"benchmark {shape}", "tasks": plan_tasks}
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shape", choices=["chain", "fanout", "random"], default="chain")
+    parser.add_argument("--tasks", type=int, default=10, help="tasks per plan")
+    parser.add_argument("--edge-prob", type=float, default=0.1, help="edge probability for --shape random")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--inflight", type=int, default=10, help="maximum concurrently running jobs")
+    parser.add_argument("--latency", default="const:0.01", help="simulated task latency distribution")
+    parser.add_argument("--concurrency", type=int, default=16, help="worker threads per agent")
+    parser.add_argument("--stream", type=int, default=0, metavar="CHUNKS",
+                        help="stream each task's output in CHUNKS chunks over stream_from: edges")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--fake", action="store_true", help="use an in-process fakeredis server")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # Keep benchmark runs out of the job archive and quiet down per-task logging
+    os.environ.setdefault("ARCHIVE_DIR", "")
+    logging.basicConfig(level=logging.WARNING)
+
+    from benchmarks._redis import use_fakeredis
+    if args.fake:
+        use_fakeredis()
+    from job_client import JobClient
+    from redis_client import get_redis_client
+    from agents.base_agent import BaseAgent
+    from orchestrator import Orchestrator
+
+    sample_latency = latency_sampler(args.latency)
+
+    class SimulatedAgent(BaseAgent):
+        consumes_streams = True
+
+        def _perform_task(self, task_data: dict):
+            if args.stream:
+                return self._stream(task_data)
+            time.sleep(sample_latency())
+            return {"content": f"result of {task_data.get('query')}"}
+
+        def _stream(self, task_data: dict):
+            # One output chunk per input chunk, so chains of streaming edges are pipelined
+            latency = sample_latency()
+            inputs = self.iter_input(task_data, "text")
+            for index in range(args.stream):
+                next(inputs, None)
+                time.sleep(latency / args.stream)
+                yield f"{task_data.get('query')}.{index} "
+
+    class TimedOrchestrator(Orchestrator):
+        """Accumulates the time spent handling each result/error message."""
+        handled = 0
+        busy_seconds = 0.0
+
+        def _handle_message(self, stream, data):
+            start = time.perf_counter()
+            try:
+                super()._handle_message(stream, data)
+            finally:
+                TimedOrchestrator.busy_seconds += time.perf_counter() - start
+                TimedOrchestrator.handled += 1
+
+    client = get_redis_client()
+    agents = [SimulatedAgent(agent_name=name, task_stream=f"tasks:{name}", concurrency=args.concurrency)
+              for name in AGENT_NAMES]
+    orchestrator = TimedOrchestrator()
+    submitter = JobClient(client)
+    threads = [threading.Thread(target=agent.run, daemon=True) for agent in agents]
+    threads.append(threading.Thread(target=orchestrator.run, daemon=True))
+    for thread in threads:
+        thread.start()
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    plans = [make_plan(args.shape, args.tasks, rng, args.edge_prob, stream=args.stream > 0) for _ in range(args.jobs)]
+
+    pending = list(plans)
+    running = {}
+    latencies = []
+    failed = 0
+    start = time.perf_counter()
+    deadline = start + args.timeout
+    while (pending or running) and time.perf_counter() < deadline:
+        batch = []
+        while pending and len(running) + len(batch) < args.inflight:
+            batch.append(pending.pop(0))
+        if batch:
+            # Submitted through the intake stream in one pipelined round trip
+            for plan in batch:
+                running[plan['job_id']] = time.perf_counter()
+            submitter.submit_plans(batch)
+
+        job_ids = list(running)
+        pipe = client.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hget(f"job:{job_id}", "status")
+        now = time.perf_counter()
+        for job_id, status in zip(job_ids, pipe.execute()):
+            if status in ("completed", "failed"):
+                latencies.append(now - running.pop(job_id))
+                failed += status == "failed"
+        time.sleep(0.002)
+    elapsed = time.perf_counter() - start
+
+    for agent in agents:
+        agent.stop()
+
+    completed = len(latencies) - failed
+    report = {
+        "revision": git_revision(),
+        "config": {
+            "shape": args.shape, "tasks": args.tasks, "jobs": args.jobs, "inflight": args.inflight,
+            "latency": args.latency, "stream": args.stream,
+            "concurrency": args.concurrency, "seed": args.seed, "fake": args.fake,
+        },
+        "jobs_completed": completed,
+        "jobs_failed": failed,
+        "jobs_timed_out": len(running) + len(pending),
+        "seconds": round(elapsed, 3),
+        "jobs_per_sec": round(completed / elapsed, 3) if elapsed else None,
+        "tasks_per_sec": round(completed * args.tasks / elapsed, 1) if elapsed else None,
+        "orchestrator_ms_per_message": round(TimedOrchestrator.busy_seconds / TimedOrchestrator.handled * 1000, 3)
+        if TimedOrchestrator.handled else None,
+        "latency_seconds": {
+            name: round(value, 4) if value is not None else None
+            for name, value in (
+                ("p50", percentile(latencies, 50)),
+                ("p95", percentile(latencies, 95)),
+                ("p99", percentile(latencies, 99)),
+                ("max", max(latencies) if latencies else None),
+            )
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# /agentic-ai-system/benchmarks/runtime_benchmark.py
+"""
+Side-by-side throughput comparison of the thread-pool BaseAgent and the
+asyncio AsyncBaseAgent with simulated I/O latency.
+
+    python -m benchmarks.runtime_benchmark --tasks 500 --latency 0.2 --concurrency 100
+    python -m benchmarks.runtime_benchmark --fake   # in-process fakeredis, no server needed
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+def build_agents(latency, jitter):
+    from agents.base_agent import BaseAgent
+    from agents.async_base_agent import AsyncBaseAgent
+
+    def delay():
+        return max(0.0, random.gauss(latency, jitter))
+
+    class SyncSleepAgent(BaseAgent):
+        def __init__(self, **kwargs):
+            super().__init__(agent_name="bench_sync", task_stream="tasks:bench_sync", **kwargs)
+
+        def _perform_task(self, task_data: dict) -> dict:
+            time.sleep(delay())
+            return {"content": task_data.get("query")}
+
+    class AsyncSleepAgent(AsyncBaseAgent):
+        def __init__(self, **kwargs):
+            super().__init__(agent_name="bench_async", task_stream="tasks:bench_async", **kwargs)
+
+        async def _perform_task(self, task_data: dict) -> dict:
+            await asyncio.sleep(delay())
+            return {"content": task_data.get("query")}
+
+    return SyncSleepAgent, AsyncSleepAgent
+
+def run_case(label, agent, client, tasks):
+    """
+    Enqueues `tasks` messages, starts the agent on a thread and measures the
+    wall time until every result has been published. Cases of one agent share
+    its result stream, so only results beyond the length found at the start
+    count.
+    """
+    result_stream = f"{agent.result_stream_prefix}{agent.agent_name}"
+    baseline = client.xlen(result_stream)
+    pipe = client.pipeline(transaction=False)
+    for i in range(tasks):
+        pipe.xadd(agent.task_stream, {"job_id": "bench", "task_id": f"t{i}", "query": f"q{i}"})
+    pipe.execute()
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=agent.run, daemon=True)
+    thread.start()
+    while client.xlen(result_stream) < baseline + tasks:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    agent.stop()
+    thread.join(timeout=10)
+
+    return {
+        "runtime": label,
+        "concurrency": agent.concurrency,
+        "tasks": tasks,
+        "seconds": round(elapsed, 3),
+        "tasks_per_sec": round(tasks / elapsed, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean simulated task latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="stddev of the simulated latency")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--fake", action="store_true", help="use an in-process fakeredis server")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    from benchmarks._redis import use_fakeredis, flush_benchmark_keys
+    if args.fake:
+        use_fakeredis()
+    from redis_client import get_redis_client
+
+    client = get_redis_client()
+    flush_benchmark_keys(client, ["bench_sync", "bench_async"])
+    SyncSleepAgent, AsyncSleepAgent = build_agents(args.latency, args.jitter)
+
+    results = [
+        run_case("sync (1 worker, legacy)", SyncSleepAgent(concurrency=1), client, min(args.tasks, 20)),
+        run_case("sync (thread pool)", SyncSleepAgent(concurrency=args.concurrency), client, args.tasks),
+        run_case("async (event loop)", AsyncSleepAgent(concurrency=args.concurrency), client, args.tasks),
+    ]
+    flush_benchmark_keys(client, ["bench_sync", "bench_async"])
+
+    print(f"{'runtime':<26}{'concurrency':>12}{'tasks':>8}{'seconds':>10}{'tasks/s':>10}")
+    for r in results:
+        print(f"{r['runtime']:<26}{r['concurrency']:>12}{r['tasks']:>8}{r['seconds']:>10}{r['tasks_per_sec']:>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"latency": args.latency, "jitter": args.jitter, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# /agentic-ai-system/blob_store.py
+
+import os
+import zlib
+import hashlib
+import logging
+from redis_client import get_binary_redis_client, get_async_binary_redis_client
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+logger = logging.getLogger("BlobStore")
+
+BLOB_PREFIX = "blob:"
+# Marker of a string value that references a blob instead of carrying the data
+REF_PREFIX = "blobref:sha256:"
+
+BLOB_THRESHOLD_BYTES = int(os.getenv("BLOB_THRESHOLD_BYTES", 16 * 1024))
+BLOB_COMPRESSION = os.getenv("BLOB_COMPRESSION", "zlib")
+BLOB_TTL_SECONDS = int(os.getenv("BLOB_TTL_SECONDS", 7 * 24 * 3600))
+
+# One-byte header in front of every stored blob naming its compression
+_HEADERS = {"none": b"n", "zlib": b"z", "zstd": b"s"}
+
+def is_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+def _key(ref: str) -> str:
+    return f"{BLOB_PREFIX}{ref[len(REF_PREFIX):]}"
+
+def _pack(raw: bytes, compression: str) -> bytes:
+    if compression == "zlib":
+        return _HEADERS["zlib"] + zlib.compress(raw, 1)
+    if compression == "zstd":
+        return _HEADERS["zstd"] + zstandard.ZstdCompressor(level=3).compress(raw)
+    return _HEADERS["none"] + raw
+
+def _unpack(stored: bytes) -> str:
+    header, body = stored[:1], stored[1:]
+    if header == _HEADERS["zlib"]:
+        body = zlib.decompress(body)
+    elif header == _HEADERS["zstd"]:
+        if zstandard is None:
+            raise RuntimeError("Blob is zstd-compressed but the 'zstandard' package is not installed.")
+        body = zstandard.ZstdDecompressor().decompress(body)
+    return body.decode("utf-8")
+
+class BlobStore:
+    """
+    Content-addressed store for large payloads. Strings above `threshold` bytes
+    are stored once under `blob:<sha256>` (optionally compressed, with a TTL
+    that is refreshed on every write) and replaced by a `blobref:sha256:<hex>`
+    reference in stream entries and job hashes. Identical payloads share one
+    blob, and readers fetch the data only when they actually need it.
+    """
+    def __init__(self, redis_client=None, threshold: int = None, compression: str = None, ttl: int = None):
+        self.redis_client = redis_client or get_binary_redis_client()
+        self.threshold = BLOB_THRESHOLD_BYTES if threshold is None else threshold
+        self.compression = compression or BLOB_COMPRESSION
+        self.ttl = ttl or BLOB_TTL_SECONDS
+        if self.compression not in _HEADERS:
+            raise ValueError(f"Unknown blob compression '{self.compression}'. Use one of {sorted(_HEADERS)}.")
+        if self.compression == "zstd" and zstandard is None:
+            logger.warning("BLOB_COMPRESSION=zstd but 'zstandard' is not installed; falling back to zlib.")
+            self.compression = "zlib"
+
+    def put(self, data: str) -> str:
+        """
+        Stores `data` unconditionally and returns its reference.
+        """
+        raw = data.encode("utf-8")
+        ref = REF_PREFIX + hashlib.sha256(raw).hexdigest()
+        key = _key(ref)
+        pipe = self.redis_client.pipeline(transaction=False)
+        # Deduplicated: the SET only happens for the first writer, later writers
+        # just extend the lifetime of the shared blob.
+        pipe.set(key, _pack(raw, self.compression), nx=True, ex=self.ttl)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+        return ref
+
+    def offload(self, value):
+        """
+        Returns a reference for strings above the threshold, `value` otherwise.
+        """
+        if isinstance(value, str) and not is_ref(value) and len(value) > self.threshold:
+            return self.put(value)
+        return value
+
+    def get(self, ref: str) -> str:
+        stored = self.redis_client.get(_key(ref))
+        if stored is None:
+            raise KeyError(f"Blob {ref} does not exist or has expired.")
+        return _unpack(stored)
+
+    def resolve(self, value):
+        """
+        Returns the data behind `value` if it is a reference, `value` otherwise.
+        """
+        return self.get(value) if is_ref(value) else value
+
+    def resolve_many(self, values: list) -> list:
+        """
+        Like `resolve` for a list, fetching all referenced blobs with one MGET.
+        """
+        refs = [value for value in values if is_ref(value)]
+        if not refs:
+            return list(values)
+        fetched = dict(zip(refs, self.redis_client.mget([_key(ref) for ref in refs])))
+        resolved = []
+        for value in values:
+            if is_ref(value):
+                if fetched[value] is None:
+                    raise KeyError(f"Blob {value} does not exist or has expired.")
+                value = _unpack(fetched[value])
+            resolved.append(value)
+        return resolved
+
+class AsyncBlobStore(BlobStore):
+    """
+    asyncio variant of BlobStore for AsyncBaseAgent.
+    """
+    def __init__(self, redis_client=None, **kwargs):
+        super().__init__(redis_client=redis_client or get_async_binary_redis_client(), **kwargs)
+
+    async def put(self, data: str) -> str:
+        raw = data.encode("utf-8")
+        ref = REF_PREFIX + hashlib.sha256(raw).hexdigest()
+        key = _key(ref)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(key, _pack(raw, self.compression), nx=True, ex=self.ttl)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+        return ref
+
+    async def offload(self, value):
+        if isinstance(value, str) and not is_ref(value) and len(value) > self.threshold:
+            return await self.put(value)
+        return value
+
+    async def get(self, ref: str) -> str:
+        stored = await self.redis_client.get(_key(ref))
+        if stored is None:
+            raise KeyError(f"Blob {ref} does not exist or has expired.")
+        return _unpack(stored)
+
+    async def resolve(self, value):
+        return await self.get(value) if is_ref(value) else value
+
+    async def resolve_many(self, values: list) -> list:
+        refs = [value for value in values if is_ref(value)]
+        if not refs:
+            return list(values)
+        fetched = dict(zip(refs, await self.redis_client.mget([_key(ref) for ref in refs])))
+        resolved = []
+        for value in values:
+            if is_ref(value):
+                if fetched[value] is None:
+                    raise KeyError(f"Blob {value} does not exist or has expired.")
+                value = _unpack(fetched[value])
+            resolved.append(value)
+        return resolved
+
+class LazyTaskData(dict):
+    """
+    Task data whose blob references are fetched on first access through
+    `[]` / `get()` and then cached in place. References inside a list value
+    (e.g. a fan-in of large results) are fetched together with one MGET.
+    Iterating or serializing the dict (e.g. for logs or error entries) keeps
+    the compact references.
+    """
+    def __init__(self, data: dict, blobs: BlobStore):
+        super().__init__(data)
+        self._blobs = blobs
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if is_ref(value):
+            value = self._blobs.get(value)
+            super().__setitem__(key, value)
+        elif isinstance(value, list) and any(is_ref(item) for item in value):
+            value = self._blobs.resolve_many(value)
+            super().__setitem__(key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
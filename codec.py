@@ -0,0 +1,96 @@
+# /agentic-ai-system/codec.py
+
+import os
+import json
+import logging
+from utils import robust_string_to_dict
+
+logger = logging.getLogger("codec")
+
+# Name of the stream entry / hash field that records how a payload is encoded
+ENCODING_FIELD = "encoding"
+
+# Routing and tracing fields of a task entry, as opposed to its details
+TASK_META_FIELDS = ("job_id", "task_id", "shard", "dispatched_at", "stream_output", "stream_input")
+
+DEFAULT_CODEC = os.getenv("PAYLOAD_CODEC", "json")
+
+# tag ("<name>/<version>") -> (encode, decode); encoders return str because the
+# Redis clients are created with decode_responses=True. Binary formats would
+# need a text wrapper (e.g. base64) that makes them larger and slower than JSON.
+_codecs = {}
+_default_versions = {}
+
+def register_codec(name: str, encode, decode, version: int = 1):
+    """
+    Registers a codec. Payloads are tagged "<name>/<version>", so a new version
+    can be introduced while entries written with the old one are still decoded.
+    """
+    tag = f"{name}/{version}"
+    _codecs[tag] = (encode, decode)
+    _default_versions[name] = max(version, _default_versions.get(name, 0))
+    return tag
+
+def available_codecs() -> list:
+    return sorted(_codecs)
+
+def encode(value, codec: str = None) -> tuple:
+    """
+    Serializes `value` with the given (or default) codec.
+
+    Returns:
+        (tag, data) where `tag` is stored next to `data` under ENCODING_FIELD.
+    """
+    name = codec or DEFAULT_CODEC
+    if "/" not in name:
+        if name not in _default_versions:
+            raise ValueError(f"Unknown codec '{name}'. Available: {available_codecs()}")
+        name = f"{name}/{_default_versions[name]}"
+    encoder, _ = _codecs[name]
+    return name, encoder(value)
+
+def decode(data, encoding: str = None):
+    """
+    Deserializes `data` written with the codec tagged `encoding`. Entries
+    without a tag predate the codec and hold a Python repr, which falls back to
+    `robust_string_to_dict`.
+    """
+    if data is None:
+        return None
+    if not encoding:
+        return robust_string_to_dict(data)
+    try:
+        _, decoder = _codecs[encoding]
+    except KeyError:
+        raise ValueError(f"Unknown payload encoding '{encoding}'. Available: {available_codecs()}") from None
+    return decoder(data)
+
+def encode_task(job_id: str, task_id: str, details: dict, codec: str = None, **meta) -> dict:
+    """
+    Builds the fields of a `tasks:*` stream entry. Routing metadata (job_id,
+    task_id, shard, ...) stays in plain fields; the task details are encoded
+    as one typed value.
+    """
+    tag, data = encode(details, codec)
+    fields = {"job_id": job_id, "task_id": task_id, **{k: v for k, v in meta.items() if v is not None}}
+    fields["details"] = data
+    fields[ENCODING_FIELD] = tag
+    return fields
+
+def decode_task(fields: dict) -> dict:
+    """
+    Inverse of `encode_task`: returns the flat task data handed to
+    `_perform_task`. Untagged (legacy) entries are returned unchanged.
+    """
+    encoding = fields.get(ENCODING_FIELD)
+    if not encoding:
+        return dict(fields)
+    task_data = {k: v for k, v in fields.items() if k not in ("details", ENCODING_FIELD)}
+    task_data.update(decode(fields.get("details"), encoding) or {})
+    return task_data
+
+register_codec(
+    "json",
+    lambda value: json.dumps(value, separators=(",", ":"), ensure_ascii=False),
+    json.loads,
+)
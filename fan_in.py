@@ -0,0 +1,104 @@
+# /agentic-ai-system/fan_in.py
+
+from streaming import result_text
+
+# References from a task detail value to the results of upstream tasks:
+#
+#   "result_from:<task_id>"             content (or summary) of one result
+#   "result_from:<task_id>:<path>"      a field of it, e.g. "result_from:search:hits.0.url"
+#   ["result_from:a", "result_from:b"]  a list of such values, in order
+#   {"fan_in": ["a", "b", ...], "path": "content", "aggregate": "concat", "separator": "\n"}
+#                                       many results, aggregated as a "list"
+#                                       (default) or concatenated ("concat")
+RESULT_FROM_PREFIX = "result_from:"
+FAN_IN_KEY = "fan_in"
+AGGREGATES = ("list", "concat")
+
+
+def _parse_single(value):
+    # -> (task_id, path) for a "result_from:" string, else None
+    if not (isinstance(value, str) and value.startswith(RESULT_FROM_PREFIX)):
+        return None
+    task_id, _, path = value[len(RESULT_FROM_PREFIX):].partition(':')
+    return task_id, path or None
+
+def is_fan_in(value) -> bool:
+    return isinstance(value, dict) and FAN_IN_KEY in value
+
+def is_reference(value) -> bool:
+    """
+    True for detail values that are resolved from upstream results.
+    """
+    if isinstance(value, list):
+        return bool(value) and all(_parse_single(item) for item in value)
+    return is_fan_in(value) or _parse_single(value) is not None
+
+def value_sources(value) -> list:
+    """
+    The upstream task_ids a detail value refers to, in order.
+    """
+    if is_fan_in(value):
+        return list(value[FAN_IN_KEY])
+    if isinstance(value, list) and is_reference(value):
+        return [_parse_single(item)[0] for item in value]
+    single = _parse_single(value)
+    return [single[0]] if single else []
+
+def referenced_sources(details: dict) -> set:
+    return {source for value in details.values() for source in value_sources(value)}
+
+def validate(value):
+    """
+    Raises ValueError for a malformed fan-in spec.
+    """
+    if not is_fan_in(value):
+        return
+    if not isinstance(value[FAN_IN_KEY], list) or not all(isinstance(task_id, str) for task_id in value[FAN_IN_KEY]):
+        raise ValueError(f"'{FAN_IN_KEY}' must be a list of task_ids, got {value[FAN_IN_KEY]!r}.")
+    if value.get("aggregate", "list") not in AGGREGATES:
+        raise ValueError(f"Unknown fan-in aggregate '{value['aggregate']}'. Use one of {AGGREGATES}.")
+
+def extract(result, path: str = None):
+    """
+    The value at a dotted `path` of a result (list indexes allowed), or its
+    content/summary without a path. Missing fields yield None.
+    """
+    if not path:
+        return result_text(result)
+    for field in path.split('.'):
+        if isinstance(result, dict):
+            result = result.get(field)
+        elif isinstance(result, list) and field.lstrip('-').isdigit() and -len(result) <= int(field) < len(result):
+            result = result[int(field)]
+        else:
+            return None
+    return result
+
+def aggregate(values: list, how: str = "list", separator: str = "\n"):
+    """
+    Combines the values of several upstream results. `concat` joins text
+    with `separator` and flattens lists; missing values are skipped.
+    """
+    if how == "list":
+        return values
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, list) for value in present):
+        return [item for value in present for item in value]
+    return separator.join(str(value) for value in present)
+
+def resolve(value, results: dict):
+    """
+    Resolves a reference detail value from `results` (task_id -> decoded
+    result). Non-reference values are returned unchanged.
+    """
+    if is_fan_in(value):
+        path = value.get("path")
+        values = [extract(results.get(task_id) or {}, path) for task_id in value[FAN_IN_KEY]]
+        return aggregate(values, value.get("aggregate", "list"), value.get("separator", "\n"))
+    if isinstance(value, list) and is_reference(value):
+        return [resolve(item, results) for item in value]
+    single = _parse_single(value)
+    if single is None:
+        return value
+    task_id, path = single
+    return extract(results.get(task_id) or {}, path)
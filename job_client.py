@@ -0,0 +1,161 @@
+# /agentic-ai-system/job_client.py
+
+import os
+import time
+import logging
+from redis_client import MAX_BLOCK_SECONDS, get_redis_client
+from utils import job_shard, shard_stream
+from retention import JOB_TTL_SECONDS
+from scheduling import DEFAULT_PRIORITY, DEFAULT_TENANT
+
+# Orchestrators consume `jobs:submitted` (`jobs:submitted:<shard>` when sharded)
+INTAKE_PREFIX = "jobs:"
+INTAKE_NAME = "submitted"
+JOB_SUBMIT_BATCH_SIZE = int(os.getenv("JOB_SUBMIT_BATCH_SIZE", 500))
+
+
+def intake_stream(shard=None) -> str:
+    return shard_stream(INTAKE_PREFIX, INTAKE_NAME, shard)
+
+def done_key(job_id: str) -> str:
+    """
+    List that receives the final status of a job when it completes or fails.
+    """
+    return f"job:{job_id}:done"
+
+def notify_done(pipe, job_id: str, status: str, ttl: int = None):
+    """
+    Queues the completion notification of a job on a pipeline.
+    """
+    ttl = JOB_TTL_SECONDS if ttl is None else ttl
+    pipe.rpush(done_key(job_id), status)
+    if ttl > 0:
+        pipe.expire(done_key(job_id), ttl)
+
+def _restore_done(redis_client, key: str, status: str):
+    # Puts a popped notification back for other waiters, with the expiry notify_done gave it
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.lpush(key, status)
+    if JOB_TTL_SECONDS > 0:
+        pipe.expire(key, JOB_TTL_SECONDS)
+    pipe.execute()
+
+
+class JobClient:
+    """
+    Submits jobs to the orchestrators through the intake stream and waits for
+    their completion.
+
+    Jobs are written in pipelined batches of `batch_size`: one round trip
+    stores the job hashes and appends their ids to the intake stream of the
+    shard owning each job, so submitting N jobs costs about
+    N / batch_size round trips plus planning. Completion is pushed by the
+    orchestrator to `job:<id>:done`, which `wait_for_job` and `as_completed`
+    block on instead of polling the job status.
+    """
+    def __init__(self, redis_client=None, planner=None, shard_count: int = None, batch_size: int = None):
+        self.redis_client = redis_client or get_redis_client()
+        self._planner = planner
+        self.shard_count = shard_count or int(os.getenv("ORCHESTRATOR_SHARDS", 1))
+        self.batch_size = batch_size or JOB_SUBMIT_BATCH_SIZE
+        self.logger = logging.getLogger("JobClient")
+
+    @property
+    def planner(self):
+        if self._planner is None:
+            from agents.planner_agent import PlannerAgent
+            self._planner = PlannerAgent()
+        return self._planner
+
+    def _intake_stream(self, job_id: str) -> str:
+        shard = job_shard(job_id, self.shard_count) if self.shard_count > 1 else None
+        return intake_stream(shard)
+
+    def _submit_prepared(self, prepared) -> list:
+        """
+        Writes (plan, fields) pairs and enqueues them, one pipeline per batch.
+        """
+        job_ids = []
+        for start in range(0, len(prepared), self.batch_size):
+            pipe = self.redis_client.pipeline(transaction=False)
+            for plan, fields in prepared[start:start + self.batch_size]:
+                job_id = plan["job_id"]
+                pipe.hset(f"job:{job_id}", mapping=fields)
+                pipe.xadd(self._intake_stream(job_id), {"job_id": job_id})
+                job_ids.append(job_id)
+            pipe.execute()
+        self.logger.info(f"Submitted {len(job_ids)} jobs.")
+        return job_ids
+
+    def submit_goals(self, goals, priority: str = DEFAULT_PRIORITY, tenant: str = DEFAULT_TENANT) -> list:
+        """
+        Plans and submits one job per goal. Returns the job ids in goal order.
+        """
+        job_ids = []
+        goals = list(goals)
+        for start in range(0, len(goals), self.batch_size):
+            prepared = [self.planner.plan_goal(goal, priority=priority, tenant=tenant)
+                        for goal in goals[start:start + self.batch_size]]
+            job_ids += self._submit_prepared(prepared)
+        return job_ids
+
+    def submit_plans(self, plans) -> list:
+        """
+        Submits ready-made plans (see PlannerAgent.prepare_plan). Returns the
+        job ids in plan order.
+        """
+        job_ids = []
+        plans = list(plans)
+        for start in range(0, len(plans), self.batch_size):
+            prepared = [self.planner.prepare_plan(plan) for plan in plans[start:start + self.batch_size]]
+            job_ids += self._submit_prepared(prepared)
+        return job_ids
+
+    def submit(self, goal: str, priority: str = DEFAULT_PRIORITY, tenant: str = DEFAULT_TENANT) -> str:
+        return self.submit_goals([goal], priority=priority, tenant=tenant)[0]
+
+    def wait_for_job(self, job_id: str, timeout: float = None):
+        """
+        Blocks until the job completes or fails and returns its final status
+        ("completed" or "failed"), or None after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            # Blocks in slices so the wait never outlasts the socket timeout
+            wait = MAX_BLOCK_SECONDS if deadline is None else min(MAX_BLOCK_SECONDS, deadline - time.monotonic())
+            if wait <= 0:
+                return None
+            # Rotating the list onto itself reads the notification without
+            # consuming it, so the key and its expiry stay as they are
+            status = self.redis_client.blmove(done_key(job_id), done_key(job_id), wait, "LEFT", "RIGHT")
+            if status is not None:
+                return status
+
+    def as_completed(self, job_ids, timeout: float = None):
+        """
+        Yields (job_id, status) as the given jobs finish, in completion order.
+        Stops early when `timeout` seconds pass without all jobs finishing.
+        """
+        remaining = {done_key(job_id): job_id for job_id in job_ids}
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        offset = 0
+        while remaining:
+            wait = MAX_BLOCK_SECONDS
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return
+            keys = list(remaining)
+            if len(keys) > 1000:
+                # Bound the BLPOP command size for very large batches: watch a
+                # rotating window of keys for at most a second at a time
+                offset %= len(keys)
+                keys = (keys[offset:] + keys[:offset])[:1000]
+                offset += 1000
+                wait = min(wait, 1.0)
+            reply = self.redis_client.blpop(keys, timeout=wait)
+            if reply is None:
+                continue
+            key, status = reply
+            _restore_done(self.redis_client, key, status)
+            yield remaining.pop(key), status
@@ -1,27 +1,36 @@
-import multiprocessing
-import time
+import os
+import signal
+import threading
 import logging
 
-from agents.planner_agent import PlannerAgent
-from agents.web_search_agent import WebSearchAgent
-from agents.summarization_agent import SummarizationAgent
+from agents.web_search_agent import WebSearchAgent, AsyncWebSearchAgent
+from agents.summarization_agent import SummarizationAgent, AsyncSummarizationAgent
 from orchestrator import Orchestrator
+from job_client import JobClient
 from utils import setup_logging
-from redis_client import get_redis_client
+from redis_client import get_redis_client, check_connection
+from retention import unlink_matching
+from scheduling import priority_streams
+from supervisor import Supervisor, WorkerPool, run_until_terminated
 
-def run_agent(agent_class):
+def _use_metrics_port(metrics_port):
+    # Each process serves its own /metrics endpoint on a distinct port
+    if metrics_port:
+        os.environ["METRICS_PORT"] = str(metrics_port)
+
+def run_agent(agent_class, metrics_port=None):
     """Target function to run an agent in a separate process."""
     setup_logging()
+    _use_metrics_port(metrics_port)
     agent = agent_class()
-    agent.run()
+    run_until_terminated(agent)
 
-def run_orchestrator():
-    """Target function to run the orchestrator."""
+def run_orchestrator(shard_ids=None, metrics_port=None):
+    """Target function to run an orchestrator owning the given shards."""
     setup_logging()
-    orchestrator = Orchestrator()
-    # A bit of a hack: give agents time to create their streams before orchestrator listens
-    time.sleep(2)
-    orchestrator.run()
+    _use_metrics_port(metrics_port)
+    orchestrator = Orchestrator(shard_ids=shard_ids)
+    run_until_terminated(orchestrator)
 
 
 if __name__ == "__main__":
@@ -30,61 +39,62 @@ if __name__ == "__main__":
 
     # Clear previous run data from Redis for a clean start
     redis_client = get_redis_client()
+    if not check_connection(redis_client):
+        raise SystemExit(1)
     logger.info("Clearing old data from Redis...")
-    for key in redis_client.scan_iter("job:*"):
-        redis_client.delete(key)
-    for key in redis_client.scan_iter("tasks:*"):
-        redis_client.delete(key)
-    for key in redis_client.scan_iter("results:*"):
-        redis_client.delete(key)
-    for key in redis_client.scan_iter("errors:*"):
-        redis_client.delete(key)
-    redis_client.delete("registered_agents")
-
-
-    # Define the agents and orchestrator to run
-    processes = {
-        "WebSearchAgent": multiprocessing.Process(target=run_agent, args=(WebSearchAgent,)),
-        "SummarizationAgent": multiprocessing.Process(target=run_agent, args=(SummarizationAgent,)),
-        "Orchestrator": multiprocessing.Process(target=run_orchestrator)
-    }
-
-    # Start all processes
-    for name, p in processes.items():
-        logger.info(f"Starting process: {name}")
-        p.start()
-
-    logger.info("All services started. Waiting a moment before creating a plan...")
-    time.sleep(3) # Give processes time to initialize
-
-    # --- Create and start a new job ---
-    planner = PlannerAgent()
+    removed = unlink_matching(redis_client, ["job:*", "jobs:*", "tasks:*", "results:*", "errors:*", "agent:*", "blob:*", "cache:*", "plancache:*", "plan_template:*", "tenant:*", "chunks:*"])
+    redis_client.unlink("registered_agents")
+    logger.info(f"Removed {removed} keys.")
+
+    # AGENT_RUNTIME=async runs each agent on a single asyncio event loop instead of a thread pool
+    if os.getenv("AGENT_RUNTIME", "sync") == "async":
+        web_search_class, summarization_class = AsyncWebSearchAgent, AsyncSummarizationAgent
+    else:
+        web_search_class, summarization_class = WebSearchAgent, SummarizationAgent
+
+    # Agent pools are autoscaled on the backlog of their task streams between
+    # AUTOSCALE_MIN_WORKERS and AUTOSCALE_MAX_WORKERS (per agent: AUTOSCALE_MAX_WORKERS_WEB_SEARCH, ...).
+    # METRICS_PORT is the first metrics port; every worker slot gets its own (0 disables metrics).
+    metrics_base = int(os.getenv("METRICS_PORT", 0))
+    supervisor = Supervisor(redis_client)
+    def add_pool(name, target, args, **kwargs):
+        offset = sum(pool.max_workers for pool in supervisor.pools.values())
+        pool = supervisor.add_pool(WorkerPool(name, target, args, **kwargs))
+        pool.metrics_port = metrics_base + offset if metrics_base else None
+
+    for agent_name, agent_class in (("web_search", web_search_class), ("summarization", summarization_class)):
+        streams = list(priority_streams(f"tasks:{agent_name}").values())
+        add_pool(agent_name, run_agent, (agent_class,), streams=streams, group=agent_name)
+    # One orchestrator process per shard; jobs are partitioned by hashing their job_id
+    shard_count = int(os.getenv("ORCHESTRATOR_SHARDS", 1))
+    for shard in range(shard_count):
+        name = "orchestrator" if shard_count == 1 else f"orchestrator-{shard}"
+        add_pool(name, run_orchestrator, ([shard],), min_workers=1)
+
+    # Start the minimum number of workers of every pool
+    supervisor.step()
+
+    # No startup delay is needed: tasks queue up in their streams until the agents'
+    # consumer groups exist, and orchestrators subscribe to agents as they register.
+    logger.info("All services started.")
+
+    # --- Submit a job ---
+    # The orchestrators pick new jobs up from the `jobs:submitted` intake stream.
+    client = JobClient(redis_client)
     goal = "Find the capital of France and provide a summary of the search results."
-    plan = planner.create_plan(goal=goal)
-
-    # The orchestrator will see the new job and start dispatching tasks
-    # We can simulate this by directly calling a method on a local orchestrator instance
-    # In a real distributed system, the orchestrator would discover this new job itself.
-    
-    # For this example, we'll give the main orchestrator process the plan.
-    # A simple way to do this is to have the orchestrator periodically check for new jobs.
-    # We will manually kickstart the first job for this example.
-    
-    local_orchestrator = Orchestrator()
-    local_orchestrator.start_new_job(plan)
-
-    logger.info(f"Job {plan['job_id']} kicked off. The system is now running.")
+    job_id = client.submit(goal)
+    logger.info(f"Job {job_id} submitted. The system is now running.")
+
+    def report_completion():
+        status = client.wait_for_job(job_id)
+        logger.info(f"Job {job_id} finished with status '{status}'.")
+    threading.Thread(target=report_completion, name="job-waiter", daemon=True).start()
+
     logger.info("Monitor the logs of the individual processes to see the workflow.")
     logger.info("Press Ctrl+C to terminate.")
 
-    try:
-        # Keep the main process alive to monitor
-        for p in processes.values():
-            p.join()
-    except KeyboardInterrupt:
-        logger.info("Termination signal received. Shutting down processes.")
-        for name, p in processes.items():
-            logger.info(f"Terminating {name}...")
-            p.terminate()
-            p.join()
-        logger.info("All processes terminated.")
\ No newline at end of file
+    # Ctrl+C or SIGTERM drains every worker before exiting
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: supervisor.stop())
+    supervisor.run()
+    logger.info("All processes terminated.")
@@ -0,0 +1,237 @@
+# /agentic-ai-system/metrics.py
+
+import os
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("metrics")
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines += self._render_sample(key, value)
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+class Registry:
+    """
+    Holds the process's metrics. Collectors are callables run on every scrape
+    to refresh gauges that are expensive to keep up to date continuously
+    (e.g. consumer group lag read from Redis).
+    """
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            collectors, metrics = list(self._collectors), list(self._metrics)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector} failed: {e}")
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# --- Agent side ---
+TASKS_TOTAL = REGISTRY.register(Counter(
+    "agent_tasks_total", "Tasks processed by agents, by outcome.", ("agent", "status")))
+QUEUE_WAIT = REGISTRY.register(Histogram(
+    "agent_queue_wait_seconds", "Time from dispatch until an agent started the task.", ("agent",)))
+SERVICE_TIME = REGISTRY.register(Histogram(
+    "agent_service_seconds", "Time spent inside _perform_task.", ("agent",)))
+CACHE_EVENTS = REGISTRY.register(Gauge(
+    "agent_cache_events", "Task result cache counters.", ("agent", "event")))
+
+# --- Orchestrator side ---
+MESSAGES_TOTAL = REGISTRY.register(Counter(
+    "orchestrator_messages_total", "Result and error messages handled.", ("agent", "kind")))
+RESULT_LAG = REGISTRY.register(Histogram(
+    "orchestrator_result_lag_seconds", "Time a result waited in its stream before the orchestrator handled it.", ("agent",)))
+HANDLE_TIME = REGISTRY.register(Histogram(
+    "orchestrator_handle_seconds", "Orchestration overhead: time spent handling one result or error message.", ("kind",)))
+TASK_LATENCY = REGISTRY.register(Histogram(
+    "orchestrator_task_latency_seconds", "Time from dispatch until the task's result was handled.", ("agent",)))
+
+# --- Redis streams ---
+GROUP_LAG = REGISTRY.register(Gauge(
+    "redis_stream_group_lag", "Entries not yet delivered to the consumer group.", ("stream", "group")))
+GROUP_PENDING = REGISTRY.register(Gauge(
+    "redis_stream_group_pending", "Entries delivered but not yet acknowledged.", ("stream", "group")))
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def observe_task(agent_name: str, task_data: dict, started_at: float, completed_at: float, status: str):
+    TASKS_TOTAL.inc(agent=agent_name, status=status)
+    SERVICE_TIME.observe(completed_at - started_at, agent=agent_name)
+    dispatched_at = _as_float(task_data.get("dispatched_at"))
+    if dispatched_at is not None:
+        QUEUE_WAIT.observe(max(0.0, started_at - dispatched_at), agent=agent_name)
+
+def observe_message(agent_name: str, kind: str, data: dict, received_at: float, handled_at: float):
+    MESSAGES_TOTAL.inc(agent=agent_name, kind=kind)
+    completed_at = _as_float(data.get("completed_at"))
+    if completed_at is not None:
+        RESULT_LAG.observe(max(0.0, received_at - completed_at), agent=agent_name)
+    dispatched_at = _as_float(data.get("dispatched_at"))
+    if dispatched_at is not None:
+        TASK_LATENCY.observe(max(0.0, handled_at - dispatched_at), agent=agent_name)
+
+def cache_collector(agent_name: str, cache):
+    """
+    Returns a collector exporting a TaskResultCache's counters.
+    """
+    def collect():
+        for event, value in cache.stats().items():
+            if event != "hit_rate":
+                CACHE_EVENTS.set(value, agent=agent_name, event=event)
+    return collect
+
+def stream_group_collector(redis_client, streams_fn):
+    """
+    Returns a collector that refreshes the per-group lag / pending gauges with
+    one pipelined XINFO GROUPS per scrape for the streams from `streams_fn()`.
+    """
+    def collect():
+        streams = list(streams_fn())
+        pipe = redis_client.pipeline(transaction=False)
+        for stream in streams:
+            pipe.xinfo_groups(stream)
+        GROUP_LAG.clear()
+        GROUP_PENDING.clear()
+        for stream, groups in zip(streams, pipe.execute(raise_on_error=False)):
+            if isinstance(groups, Exception):
+                continue
+            for group in groups:
+                GROUP_PENDING.set(group.get("pending", 0), stream=stream, group=group.get("name"))
+                if group.get("lag") is not None:
+                    GROUP_LAG.set(group["lag"], stream=stream, group=group.get("name"))
+    return collect
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+
+def start_metrics_server(port: int = None):
+    """
+    Serves the registry in Prometheus text format on http://0.0.0.0:<port>/metrics
+    from a daemon thread. The port defaults to METRICS_PORT; 0 disables it.
+    Returns the server, or None when disabled.
+    """
+    global _server
+    port = int(os.getenv("METRICS_PORT", 0)) if port is None else port
+    if not port or _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    except OSError as e:
+        logger.error(f"Could not serve metrics on port {port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on port {port}.")
+    return _server
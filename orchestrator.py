@@ -1,146 +1,629 @@
 # /agentic-ai-system/orchestrator.py
 
+import os
+import socket
+import uuid
 import logging
-import json
 import time
 from redis_client import get_redis_client
-from utils import robust_string_to_dict
+import codec
+from utils import job_shard, shard_stream
+from plan_dag import CompiledPlan, PlanCache
+from plan_cache import PlanTemplateStore, render_template
+import fan_in
+from state_scripts import JobStateScripts
+from agent_registry import AgentRegistry
+from blob_store import BlobStore, is_ref
+from retention import RetentionManager
+from reclaim import PendingReclaimer
+from scheduling import DEFAULT_TENANT, AdmissionController, priority_streams, task_stream
+from job_client import intake_stream, notify_done
+from metrics import REGISTRY, HANDLE_TIME, observe_message, stream_group_collector, start_metrics_server
 
 class Orchestrator:
-    def __init__(self):
+    """
+    Drives jobs through their plans. Job ownership is partitioned across
+    ORCHESTRATOR_SHARDS shards by hashing the job_id: results of a job are
+    published to that shard's streams, so every job is handled by the
+    orchestrator process that owns its shard and per-job ordering is kept.
+
+    New jobs arrive on the shard's intake stream (`jobs:submitted`, see
+    job_client.py); their final status is pushed to `job:<id>:done`.
+    """
+    def __init__(self, shard_ids=None, shard_count: int = None, batch_size: int = None):
         self.redis_client = get_redis_client()
         self.logger = logging.getLogger("Orchestrator")
-        self.result_streams = [s for s in self.redis_client.keys('results:*')]
-        self.error_streams = [s for s in self.redis_client.keys('errors:*')]
-        self.stream_keys = self.result_streams + self.error_streams
-
-        if not self.stream_keys:
-            self.logger.warning("No result or error streams found. Will listen on default streams.")
-            self.stream_keys = ['results:web_search', 'results:summarization', 'errors:web_search', 'errors:summarization']
+        self.group_name = "orchestrator-group"
+        self.consumer_name = f"orchestrator-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.shard_count = shard_count or int(os.getenv("ORCHESTRATOR_SHARDS", 1))
+        if shard_ids is None:
+            shard_env = os.getenv("ORCHESTRATOR_SHARD_IDS")
+            shard_ids = [int(s) for s in shard_env.split(",")] if shard_env else range(self.shard_count)
+        self.shard_ids = list(shard_ids)
+        self.batch_size = batch_size or int(os.getenv("ORCHESTRATOR_BATCH_SIZE", 100))
+        self.scripts = JobStateScripts(self.redis_client)
+        self.blobs = BlobStore()
+        self.retention = RetentionManager(self.redis_client)
+        self.reclaimer = PendingReclaimer(self.redis_client, self.group_name, self.consumer_name)
+        self.trim_interval = float(os.getenv("STREAM_TRIM_INTERVAL", 60))
+        self._last_trim = time.monotonic()
+        # JOB_TIMINGS=1 stores a per-task timing breakdown in the job hash
+        self.job_timings = os.getenv("JOB_TIMINGS", "0") == "1"
+        self._stopping = False
+        self.plans = PlanCache(max_size=int(os.getenv("ORCHESTRATOR_PLAN_CACHE_SIZE", 1024)))
+        self.templates = PlanTemplateStore(self.redis_client)
+        self.admission = AdmissionController(self.redis_client)
 
-        for stream in self.stream_keys:
+        # Result/error streams are derived from the agent registry and extended
+        # at runtime when new agents announce themselves.
+        self.registry = AgentRegistry(self.redis_client)
+        self.registry_events = self.registry.subscribe()
+        self.registry_refresh_interval = float(os.getenv("ORCHESTRATOR_REGISTRY_REFRESH", 30))
+        self.agent_names = set()
+        self.intake_streams = [intake_stream(self._shard_suffix(shard)) for shard in self.shard_ids]
+        for stream in self.intake_streams:
             try:
-                self.redis_client.xgroup_create(stream, "orchestrator-group", id='0', mkstream=True)
+                self.redis_client.xgroup_create(stream, self.group_name, id='0', mkstream=True)
             except Exception:
                 self.logger.info(f"Group for {stream} already exists.")
+        self.stream_keys = list(self.intake_streams)
+        self._refresh_registry()
+
+
+    def _add_agents(self, agent_names):
+        """
+        Starts listening to the result and error streams of newly registered agents.
+        """
+        for agent_name in sorted(set(agent_names) - self.agent_names):
+            self.agent_names.add(agent_name)
+            for shard in self.shard_ids:
+                for prefix in ('results:', 'errors:'):
+                    stream = shard_stream(prefix, agent_name, self._shard_suffix(shard))
+                    try:
+                        self.redis_client.xgroup_create(stream, self.group_name, id='0', mkstream=True)
+                    except Exception:
+                        self.logger.info(f"Group for {stream} already exists.")
+                    self.stream_keys.append(stream)
+            self.logger.info(f"Listening for results of agent '{agent_name}'.")
+
+
+    def _refresh_registry(self):
+        # Full re-read of the (small) registry set; a safety net for missed Pub/Sub events
+        self._add_agents(self.registry.agent_names())
+        self._last_registry_refresh = time.monotonic()
+
+
+    def _poll_registry(self, timeout=0.0):
+        """
+        Applies pending registration events. Blocks up to `timeout` seconds for
+        the first one, which is used while no agent is registered yet.
+        """
+        message = self.registry_events.get_message(timeout=timeout)
+        while message is not None:
+            if message.get('type') == 'message':
+                self._add_agents([message['data']])
+            message = self.registry_events.get_message(timeout=0.0)
+        if time.monotonic() - self._last_registry_refresh > self.registry_refresh_interval:
+            self._refresh_registry()
+
+
+    def _maybe_trim_streams(self):
+        """
+        Periodically trims acknowledged entries (by age and length) from the
+        streams this orchestrator listens to and from the task streams of
+        known agents.
+        """
+        if time.monotonic() - self._last_trim < self.trim_interval:
+            return
+        self._last_trim = time.monotonic()
+        self.retention.trim_streams(self._observed_streams())
+
+
+    def _shard_suffix(self, shard):
+        # Unsharded deployments keep the plain `results:<agent>` stream names
+        return shard if self.shard_count > 1 else None
+
+
+    def _load_plan(self, job_id):
+        """
+        Returns the compiled DAG for a job, compiling it from Redis (plan plus
+        task statuses, one HGETALL) when it is not in the in-memory cache.
+        """
+        compiled = self.plans.get(job_id)
+        if compiled is not None:
+            return compiled
+
+        compiled = self._compile(job_id, self.redis_client.hgetall(f"job:{job_id}"))
+        if compiled is not None:
+            self.plans.put(job_id, compiled)
+        return compiled
+
+
+    def _plan_from_state(self, job_id, job_state):
+        """
+        Returns the plan stored in a `job:<id>` hash, rendering template plans,
+        or None when the hash holds no (loadable) plan.
+        """
+        template_id = job_state.get("plan_template")
+        if template_id:
+            template_tasks = self.templates.get(template_id)
+            if template_tasks is None:
+                self.logger.error(f"Plan template {template_id} of job {job_id} not found.")
+                return None
+            params = codec.decode(self.blobs.resolve(job_state["plan_params"]), job_state.get("plan_encoding") or "json/1")
+            plan = {"job_id": job_id, "tasks": render_template(template_tasks, params)}
+        elif job_state.get("plan"):
+            plan = codec.decode(self.blobs.resolve(job_state["plan"]), job_state.get("plan_encoding") or "json/1")
+        else:
+            return None
+        for field in ("goal", "priority", "tenant"):
+            if job_state.get(field):
+                plan.setdefault(field, job_state[field])
+        return plan
+
 
+    def _compile(self, job_id, job_state):
+        """
+        Compiles a job's DAG from its `job:<id>` hash.
+        """
+        plan = self._plan_from_state(job_id, job_state)
+        if plan is None:
+            return None
+        return CompiledPlan.from_job_state(plan, job_state)
 
-    def _dispatch_task(self, job_id, task):
-        task_agent = task['agent']
-        task_stream = f"tasks:{task_agent}"
-        payload = {
-            "job_id": job_id,
-            "task_id": task['task_id'],
-            **task['details']
+
+    def _archive_record(self, job_id, job_state):
+        """
+        The job hash as it is archived: blob references (large results, plan
+        params) are resolved and a template plan is rendered into `plan`, so
+        the record stays complete after blobs and templates expired.
+        """
+        record = dict(job_state)
+        fields = [field for field, value in record.items() if is_ref(value)]
+        try:
+            record.update(zip(fields, self.blobs.resolve_many([record[field] for field in fields])))
+        except KeyError as e:
+            self.logger.warning(f"Archiving job {job_id} with unresolved blob references: {e}")
+        if record.get("plan_template"):
+            try:
+                plan = self._plan_from_state(job_id, job_state)
+            except Exception as e:
+                self.logger.warning(f"Could not render the plan of job {job_id} for the archive: {e}")
+                plan = None
+            if plan is not None:
+                record["plan"] = codec.encode(plan, record.get("plan_encoding") or "json/1")[1]
+        return record
+
+
+    def _resolve_details(self, task, results):
+        """
+        Fills in the `result_from:` references and fan-in specs of a task's
+        details (see fan_in.py) from the decoded upstream `results`.
+        """
+        return {key: fan_in.resolve(value, results) for key, value in task['details'].items()}
+
+    def _offload(self, value):
+        # Large values travel as blob references; list items (e.g. fan-in
+        # results) are offloaded one by one, so identical items share a blob
+        if isinstance(value, list):
+            return [self.blobs.offload(item) for item in value]
+        return self.blobs.offload(value)
+
+
+    def _prepare_dispatch(self, job_id, compiled, task_ids, known_results):
+        """
+        Builds the (task_id, stream, dependencies, payload) candidates for the
+        state transition script. The upstream results referenced by all of the
+        tasks (fan-ins included) that are not already in hand are fetched with
+        a single HMGET and their blobs with a single MGET; `known_results` maps
+        task_id to a (result, encoding) pair as received. Each result is
+        decoded once however many tasks reference it, and large detail values
+        are passed on to the agents as blob references. A task referencing a
+        result that is not recorded yet gets an empty payload, which only
+        probes whether it is ready.
+        """
+        sources = {
+            source
+            for task_id in task_ids
+            for source in fan_in.referenced_sources(compiled.tasks[task_id]['details'])
         }
-        self.redis_client.xadd(task_stream, payload)
-        self.logger.info(f"Dispatched task {task['task_id']} for job {job_id} to stream {task_stream}")
-        self.redis_client.hset(f"job:{job_id}", f"task_status:{task['task_id']}", "dispatched")
+        raw_results = {source: known_results[source] for source in sources if source in known_results}
+        missing = [source for source in sources if source not in raw_results]
+        if missing:
+            fields = [field for source in missing for field in (f"result:{source}", f"result_encoding:{source}")]
+            fetched = self.redis_client.hmget(f"job:{job_id}", fields)
+            for index, source in enumerate(missing):
+                raw_results[source] = (fetched[2 * index], fetched[2 * index + 1])
+        names = list(raw_results)
+        data = self.blobs.resolve_many([raw_results[name][0] for name in names])
+        results = {name: codec.decode(value, raw_results[name][1]) for name, value in zip(names, data)}
+
+        shard = self._shard_suffix(job_shard(job_id, self.shard_count))
+        candidates = []
+        for task_id in task_ids:
+            task = compiled.tasks[task_id]
+            if any(raw_results[source][0] is None for source in fan_in.referenced_sources(task['details'])):
+                candidates.append((task_id, task_stream(task['agent'], compiled.priority),
+                                   compiled.dispatch_dependencies(task_id), {}))
+                continue
+            # The shard tells the agent which shard's result stream to publish to
+            details = {key: self._offload(value) for key, value in self._resolve_details(task, results).items()}
+            # Producers of streaming edges publish chunks; their consumers read them
+            payload = codec.encode_task(
+                job_id, task_id, details, shard=shard, dispatched_at=f"{time.time():.6f}",
+                stream_output="1" if compiled.streams_output(task_id) else None,
+                stream_input="1" if compiled.streaming[task_id] else None,
+            )
+            # Tasks go to the task stream of the job's priority class
+            candidates.append((task_id, task_stream(task['agent'], compiled.priority),
+                               compiled.dispatch_dependencies(task_id), payload))
+        return candidates
+
 
+    def _transition(self, job_id, compiled, task_ids, known_results=None, completed_task=None, result="",
+                    result_encoding="", job_status=None):
+        """
+        Records a completion (if any) and dispatches tasks in one atomic
+        server-side call, then mirrors the outcome in the compiled DAG.
 
-    def _handle_result(self, job_id, task_id, result):
+        Besides `task_ids`, the tasks this DAG considers ready, every pending
+        successor of `completed_task` is proposed, and consumers of streaming
+        edges go in the same call as their producer. The script decides from
+        the job hash which of them are ready, so a DAG that missed results
+        handled by another orchestrator neither skips nor repeats a dispatch;
+        such a DAG is rebuilt from Redis on the next access. Tasks found ready
+        whose payload could not be built (a result they reference was
+        recorded concurrently) are dispatched by a follow-up transition.
+
+        Returns:
+            (recorded, job_completed) as reported by the script.
+        """
+        proposed = list(task_ids)
+        if completed_task is not None:
+            proposed += [successor for successor in compiled.successors[completed_task]
+                         if successor not in compiled.dispatched and successor not in compiled.completed]
+        try:
+            candidates = self._prepare_dispatch(job_id, compiled, compiled.dispatch_order(proposed), known_results or {})
+            recorded, dispatched, probes, job_completed = self.scripts.transition(
+                job_id, candidates, completed_task=completed_task, result=result,
+                result_encoding=result_encoding, job_status=job_status,
+                task_count=len(compiled.tasks) if completed_task is not None else 0
+            )
+        except Exception:
+            # The DAG was updated ahead of Redis; rebuild it on the next access
+            self.plans.evict(job_id)
+            raise
+        stale = bool(probes) or job_completed != compiled.is_complete
+        for task_id, stream, _, _ in candidates:
+            if task_id in dispatched:
+                # A dispatched task that still has unmet dependencies here means this DAG missed results
+                stale = stale or compiled.indegree[task_id] > 0
+                compiled.mark_dispatched(task_id)
+                self.logger.info(f"Dispatched task {task_id} for job {job_id} to stream {stream}")
+        if stale or compiled.ready_tasks():
+            self.logger.info(f"Job {job_id} was advanced by another orchestrator; reloading its state.")
+            self.plans.evict(job_id)
+        if probes:
+            current = self._load_plan(job_id)
+            if current is not None:
+                current.recovered = False
+                self._transition(job_id, current, current.ready_tasks())
+        return recorded, job_completed
+
+
+    def _handle_result(self, job_id, task_id, result, encoding=None):
         self.logger.info(f"Handling result for job {job_id}, task {task_id}.")
-        self.redis_client.hset(f"job:{job_id}", f"result:{task_id}", result)
-        self.redis_client.hset(f"job:{job_id}", f"task_status:{task_id}", "completed")
-        self._check_and_dispatch_next_tasks(job_id)
+        # Load the DAG before recording the result so a rebuilt state does not
+        # already count this task as completed.
+        compiled = self._load_plan(job_id)
+        if compiled is None:
+            # Unknown or already expired job (e.g. a late result of a failed job)
+            self.logger.warning(f"No plan found for job {job_id}; dropping result of task {task_id}.")
+            return False
 
+        ready = compiled.complete(task_id)
+        if compiled.recovered:
+            # Catch up on tasks that became ready before a restart but were never dispatched
+            ready = compiled.ready_tasks()
+            compiled.recovered = False
 
-    def _check_and_dispatch_next_tasks(self, job_id):
-        plan_str = self.redis_client.hget(f"job:{job_id}", "plan")
-        if not plan_str: return
+        recorded, job_completed = self._transition(
+            job_id, compiled, ready, known_results={task_id: (result, encoding)},
+            completed_task=task_id, result=result, result_encoding=encoding
+        )
+        if not recorded:
+            self.logger.info(f"Duplicate result for job {job_id}, task {task_id} ignored.")
+        elif job_completed:
+            self._complete_job(job_id, compiled)
+        return recorded
 
-        plan = json.loads(plan_str)
-        all_tasks = plan['tasks']
-        job_state = self.redis_client.hgetall(f"job:{job_id}")
 
-        completed_tasks = {
-            k.split(':')[1] for k, v in job_state.items() 
-            if k.startswith("task_status:") and v == "completed"
-        }
+    def _complete_job(self, job_id, compiled):
+        self.plans.evict(job_id)
+        final_state = self.redis_client.hgetall(f"job:{job_id}")
+
+        self.logger.info("="*60)
+        self.logger.info(f"  JOB COMPLETED: {job_id}")
+        self.logger.info("="*60)
+        self.logger.info(f"Goal: {compiled.goal}")
 
-        for task in all_tasks:
-            task_id = task['task_id']
-            if job_state.get(f"task_status:{task_id}") not in ["dispatched", "completed", "failed"]:
-                dependencies = set(task['dependencies'])
-                if dependencies.issubset(completed_tasks):
-                    for key, value in task['details'].items():
-                        if isinstance(value, str) and value.startswith("result_from:"):
-                            source_task = value.split(':')[1]
-                            # The result is stored as a stringified dict, so parse it
-                            source_result_str = self.redis_client.hget(f"job:{job_id}", f"result:{source_task}")
-                            # source_result = eval(source_result_str)
-                            source_result = robust_string_to_dict(source_result_str)
-                            # A simple resolver; can be made more robust
-                            task['details'][key] = source_result.get('content') or source_result.get('summary')
-                    self._dispatch_task(job_id, task)
-
-        # *** NEW: Enhanced job completion check and logging ***
-        if len(completed_tasks) == len(all_tasks):
-            self.redis_client.hset(f"job:{job_id}", "status", "completed")
-            final_state = self.redis_client.hgetall(f"job:{job_id}")
-            
-            self.logger.info("="*60)
-            self.logger.info(f"  JOB COMPLETED: {job_id}")
-            self.logger.info("="*60)
-            self.logger.info(f"Goal: {plan.get('goal', 'N/A')}")
-            
-            final_result_task_id = all_tasks[-1]['task_id']
-            final_result = final_state.get(f'result:{final_result_task_id}', 'N/A')
-            
-            self.logger.info(f"\n--- Final Result (from task: {final_result_task_id}) ---\n{final_result}\n")
-            self.logger.info("--- Full Job Report ---")
-            for key, value in final_state.items():
-                if key not in ['plan']:
-                    self.logger.info(f"  {key}: {value}")
-            self.logger.info("="*60)
+        final_result_task_id = compiled.final_task_id
+        final_result = final_state.get(f'result:{final_result_task_id}', 'N/A')
+
+        self.logger.info(f"\n--- Final Result (from task: {final_result_task_id}) ---\n{final_result}\n")
+        self.logger.info("--- Full Job Report ---")
+        for key, value in final_state.items():
+            if key not in ['plan']:
+                self.logger.info(f"  {key}: {value}")
+        self.logger.info("="*60)
+        self._finish_job(job_id, final_state, "completed", compiled.tenant)
+
+
+    def _finish_job(self, job_id, job_state, status, tenant):
+        """
+        Archives a finished job, notifies its waiters and hands its admission
+        slot to the tenant's next queued job.
+        """
+        self.retention.finish_job(job_id, self._archive_record(job_id, job_state))
+        pipe = self.redis_client.pipeline(transaction=False)
+        notify_done(pipe, job_id, status, ttl=self.retention.job_ttl)
+        pipe.execute()
+        self._release_admission(tenant, job_id)
 
 
     def start_new_job(self, plan: dict):
-        job_id = plan['job_id']
-        self.logger.info(f"Starting new job: {job_id}")
-        self.redis_client.hset(f"job:{job_id}", "status", "running")
-        self._check_and_dispatch_next_tasks(job_id)
+        """
+        Starts a job in-process. Jobs submitted through JobClient arrive on the
+        intake stream instead.
+        """
+        self._start_job(plan['job_id'], CompiledPlan(plan))
 
 
-    def run(self):
-        self.logger.info("Orchestrator starting. Listening for results and errors...")
-        while True:
+    def _start_submitted(self, job_ids):
+        """
+        Starts jobs read from the intake stream, loading all their hashes in one
+        pipelined round trip. Redelivered submissions of jobs that already left
+        the `pending` state are ignored. Jobs whose plan is missing or invalid
+        (e.g. a cycle or an unknown dependency) fail right away; a retry would
+        not change that. Returns the job_ids that failed to start for other
+        reasons, which are retried.
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hgetall(f"job:{job_id}")
+        failed = []
+        for job_id, job_state in zip(job_ids, pipe.execute()):
+            if not job_state:
+                self.logger.warning(f"Submitted job {job_id} not found; skipping it.")
+                continue
+            if job_state.get("status") != "pending":
+                continue
             try:
-                messages = self.redis_client.xreadgroup(
-                    groupname="orchestrator-group",
-                    consumername="orchestrator-consumer",
-                    streams={key: '>' for key in self.stream_keys},
-                    count=1,
-                    block=2000
-                )
-
-                if not messages:
+                try:
+                    compiled = self._compile(job_id, job_state)
+                except ValueError as e:
+                    self.logger.error(f"Submitted job {job_id} has an invalid plan: {e}")
+                    self._fail_job(job_id, f"Invalid plan: {e}")
                     continue
+                if compiled is None:
+                    self.logger.error(f"Submitted job {job_id} has no plan.")
+                    self._fail_job(job_id, "Job has no plan.")
+                    continue
+                compiled.recovered = False
+                self._start_job(job_id, compiled)
+            except Exception as e:
+                self.logger.error(f"Could not start submitted job {job_id}: {e}", exc_info=True)
+                failed.append(job_id)
+        return failed
+
+
+    def _start_job(self, job_id, compiled):
+        if not self.admission.admit(compiled.tenant, job_id):
+            # Started by whichever orchestrator finishes one of the tenant's running jobs
+            self.redis_client.hset(f"job:{job_id}", "status", "queued")
+            self.logger.info(f"Job {job_id} queued: tenant '{compiled.tenant}' is at its running-jobs limit.")
+            return
+        self.logger.info(f"Starting new job: {job_id} (priority {compiled.priority}, tenant {compiled.tenant})")
+        self.plans.put(job_id, compiled)
+        self._transition(job_id, compiled, compiled.ready_tasks(), job_status="running")
+
+
+    def _release_admission(self, tenant, job_id):
+        """
+        Frees a finished job's admission slot and starts the tenant's queued
+        jobs that were admitted in its place.
+        """
+        next_job_id = self.admission.release(tenant, job_id)
+        while next_job_id:
+            compiled = self._load_plan(next_job_id)
+            if compiled is None:
+                # Expired or deleted while queued; pass the slot on
+                self.logger.warning(f"Queued job {next_job_id} no longer exists; skipping it.")
+                next_job_id = self.admission.release(tenant, next_job_id)
+                continue
+            self.logger.info(f"Starting queued job: {next_job_id} (tenant {tenant})")
+            self._transition(next_job_id, compiled, compiled.ready_tasks(), job_status="running")
+            compiled.recovered = False
+            if job_shard(next_job_id, self.shard_count) not in self.shard_ids:
+                # Results of the job go to the orchestrator owning its shard
+                self.plans.evict(next_job_id)
+            break
+
+
+    def _handle_message(self, stream, data):
+        job_id = data.get('job_id')
+        # *** FIXED: Read task_id directly from the result/error message ***
+        task_id = data.get('task_id')
+
+        if not job_id or not task_id:
+            self.logger.warning(f"Received message without job_id or task_id: {data}")
+            return
+
+        if stream.startswith("results:"):
+            self.logger.info(f"Received result for task {task_id} from {stream}")
+            recorded = self._handle_result(job_id, task_id, data.get('result'), data.get(codec.ENCODING_FIELD))
+            if recorded and self.job_timings:
+                self._record_timing(job_id, task_id, data)
+
+        elif stream.startswith("errors:"):
+            self.logger.error(f"Received error for task {task_id} from {stream}: {data}")
+            self._fail_job(job_id, data.get('error', ''), task_id=task_id)
+
+
+    def _fail_job(self, job_id, error, task_id=None):
+        """
+        Marks a job failed, recording `error` for the failed task (or for the
+        job itself), and finishes it unless it had already failed, so waiters
+        are notified and its admission slot is released.
+        """
+        self.plans.evict(job_id)
+        fields = {"status": "failed"}
+        if task_id:
+            fields.update({f"task_status:{task_id}": "failed", f"error:{task_id}": error})
+        else:
+            fields["error"] = error
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hget(f"job:{job_id}", "status")
+        pipe.hset(f"job:{job_id}", mapping=fields)
+        pipe.hgetall(f"job:{job_id}")
+        previous_status, _, job_state = pipe.execute()
+        if previous_status != "failed":
+            self._finish_job(job_id, job_state, "failed", job_state.get("tenant") or DEFAULT_TENANT)
+
 
-                stream, msg_list = messages[0]
-                message_id, data = msg_list[0]
-                
-                job_id = data.get('job_id')
-                # *** FIXED: Read task_id directly from the result/error message ***
-                task_id = data.get('task_id')
+    def _record_timing(self, job_id, task_id, data):
+        """
+        Stores the per-task timing breakdown (seconds) as `timing:<task_id>`.
+        """
+        stamps = {name: float(data[name]) for name in ('dispatched_at', 'received_at', 'started_at', 'completed_at') if data.get(name)}
+        stamps['handled_at'] = time.time()
+        breakdown = {name: round(value, 6) for name, value in stamps.items()}
+        if 'dispatched_at' in stamps and 'started_at' in stamps:
+            breakdown['queue_wait'] = round(stamps['started_at'] - stamps['dispatched_at'], 6)
+        if 'started_at' in stamps and 'completed_at' in stamps:
+            breakdown['service'] = round(stamps['completed_at'] - stamps['started_at'], 6)
+        if 'completed_at' in stamps:
+            breakdown['result_lag'] = round(stamps['handled_at'] - stamps['completed_at'], 6)
+        self.redis_client.hset(f"job:{job_id}", f"timing:{task_id}", codec.encode(breakdown, "json")[1])
 
-                if not job_id or not task_id:
-                    self.logger.warning(f"Received message without job_id or task_id: {data}")
-                    self.redis_client.xack(stream, "orchestrator-group", message_id)
+
+    def _process_messages(self, messages):
+        """
+        Handles every message of every stream returned by a read, then
+        acknowledges the whole batch in one pipelined round trip.
+        """
+        acks = {}
+        received_at = time.time()
+        for stream, msg_list in messages:
+            if stream in self.intake_streams:
+                started = time.time()
+                failed = set(self._start_submitted([data.get('job_id') for _, data in msg_list]))
+                HANDLE_TIME.observe((time.time() - started) / len(msg_list), kind="intake")
+                # Submissions that failed to start stay pending for the reclaimer
+                started_ids = [message_id for message_id, data in msg_list if data.get('job_id') not in failed]
+                if started_ids:
+                    acks[stream] = started_ids
+                continue
+            kind = "result" if stream.startswith("results:") else "error"
+            agent_name = stream.split(':')[1]
+            for message_id, data in msg_list:
+                try:
+                    started = time.time()
+                    self._handle_message(stream, data)
+                    observe_message(agent_name, kind, data, received_at, time.time())
+                    HANDLE_TIME.observe(time.time() - started, kind=kind)
+                except Exception as e:
+                    # Left pending; the reclaimer retries it with backoff
+                    self.logger.error(f"Error handling message {message_id} from {stream}: {e}", exc_info=True)
                     continue
+                acks.setdefault(stream, []).append(message_id)
+
+        if acks:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for stream, message_ids in acks.items():
+                pipe.xack(stream, self.group_name, *message_ids)
+            pipe.execute()
 
-                if "results:" in stream:
-                    self.logger.info(f"Received result for task {task_id} from {stream}")
-                    self._handle_result(job_id, task_id, data.get('result'))
 
-                elif "errors:" in stream:
-                    self.logger.error(f"Received error for task {task_id} from {stream}: {data}")
-                    self.redis_client.hset(f"job:{job_id}", "status", "failed")
-                    self.redis_client.hset(f"job:{job_id}", f"task_status:{task_id}", "failed")
-                    self.redis_client.hset(f"job:{job_id}", f"error:{task_id}", data.get('error'))
+    def _reclaim(self):
+        """
+        Takes over results, errors and submissions left pending by a crashed
+        orchestrator, or whose handling failed, and processes them again.
+        Messages that exceeded the delivery limit fail their job.
+        """
+        for stream in self.stream_keys:
+            while not self._stopping:
+                claimed, dead = self.reclaimer.reclaim(stream, count=self.batch_size)
+                if not claimed and not dead:
+                    break
+                if claimed:
+                    self._process_messages([(stream, claimed)])
+                if dead:
+                    self._fail_dead_lettered(stream, dead)
 
-                self.redis_client.xack(stream, "orchestrator-group", message_id)
+
+    def _fail_dead_lettered(self, stream, dead):
+        """
+        Fails the jobs of dead-lettered messages; they would otherwise stay
+        `running` (or `pending`, for submissions) with nobody to finish them.
+        """
+        for message_id, data in dead:
+            job_id = data.get('job_id')
+            if not job_id:
+                continue
+            error = (f"Message {message_id} on {stream} exceeded {self.reclaimer.max_deliveries} deliveries "
+                     f"and was dead-lettered.")
+            try:
+                if stream in self.intake_streams:
+                    # A submission only failed if its job never left the pending state
+                    if self.redis_client.hget(f"job:{job_id}", "status") != "pending":
+                        continue
+                    self._fail_job(job_id, error)
+                else:
+                    self._fail_job(job_id, error, task_id=data.get('task_id'))
+                self.logger.error(f"Job {job_id} failed: {error}")
+            except Exception as e:
+                self.logger.error(f"Could not fail job {job_id} of dead-lettered message {message_id}: {e}", exc_info=True)
+
+
+    def _observed_streams(self):
+        return self.stream_keys + [
+            stream for agent_name in sorted(self.agent_names) for stream in priority_streams(f"tasks:{agent_name}").values()
+        ]
+
+
+    def run(self):
+        REGISTRY.add_collector(stream_group_collector(self.redis_client, self._observed_streams))
+        start_metrics_server()
+        self.logger.info(
+            f"Orchestrator '{self.consumer_name}' starting for shards {self.shard_ids} of {self.shard_count}. "
+            f"Listening for results and errors..."
+        )
+        while not self._stopping:
+            try:
+                self._poll_registry()
+                self._maybe_trim_streams()
+                if self.reclaimer.due():
+                    self._reclaim()
+
+                messages = self.redis_client.xreadgroup(
+                    groupname=self.group_name,
+                    consumername=self.consumer_name,
+                    streams={key: '>' for key in self.stream_keys},
+                    count=self.batch_size,
+                    block=2000
+                )
+
+                if messages:
+                    self._process_messages(messages)
 
             except Exception as e:
                 self.logger.error(f"Error in orchestrator loop: {e}", exc_info=True)
-                time.sleep(5)
\ No newline at end of file
+                time.sleep(5)
+        self.logger.info(f"Orchestrator '{self.consumer_name}' stopped.")
+
+    def stop(self):
+        """
+        Asks the main loop to exit once the batch currently in flight is handled.
+        """
+        self._stopping = True
@@ -0,0 +1,282 @@
+# /agentic-ai-system/plan_cache.py
+
+import os
+import re
+import json
+import math
+import zlib
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+import codec
+from streaming import is_stream_ref
+from fan_in import is_reference
+
+TEMPLATE_PREFIX = "plan_template:"
+GOAL_CACHE_PREFIX = "plancache:"
+# Marker of a task detail value that is filled in per job from the plan params
+PARAM_PREFIX = "param:"
+
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", 1024))
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", 24 * 3600))
+PLAN_CACHE_SIMILARITY = float(os.getenv("PLAN_CACHE_SIMILARITY", 0))
+# Templates kept in memory per process, and lifetime of `plan_template:*` keys
+# (refreshed whenever a template is used; 0 keeps them forever)
+PLAN_TEMPLATE_CACHE_SIZE = int(os.getenv("PLAN_TEMPLATE_CACHE_SIZE", 1024))
+PLAN_TEMPLATE_TTL_SECONDS = int(os.getenv("PLAN_TEMPLATE_TTL_SECONDS", 7 * 24 * 3600))
+
+
+def normalize_goal(goal: str) -> str:
+    """
+    Case, punctuation and whitespace insensitive form of a goal, used as the
+    exact-match cache key.
+    """
+    return " ".join(re.findall(r"\w+", goal.lower()))
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def compile_template(tasks: list) -> tuple:
+    """
+    Splits concrete plan tasks into a reusable template and its parameters.
+    Every literal detail value becomes `param:<task_id>.<key>`; references such
+    as `result_from:`, fan-in specs and `stream_from:` are structure and stay
+    in the template.
+
+    Returns:
+        (template_tasks, params)
+    """
+    template_tasks, params = [], {}
+    for task in tasks:
+        details = {}
+        for key, value in task.get("details", {}).items():
+            if is_reference(value) or is_stream_ref(value):
+                details[key] = value
+            else:
+                name = f"{task['task_id']}.{key}"
+                params[name] = value
+                details[key] = f"{PARAM_PREFIX}{name}"
+        template_tasks.append({**task, "details": details})
+    return template_tasks, params
+
+def render_template(template_tasks: list, params: dict) -> list:
+    """
+    Inverse of compile_template: fills the `param:` placeholders of a template.
+    """
+    tasks = []
+    for task in template_tasks:
+        details = {}
+        for key, value in task["details"].items():
+            if isinstance(value, str) and value.startswith(PARAM_PREFIX):
+                value = params[value[len(PARAM_PREFIX):]]
+            details[key] = value
+        tasks.append({**task, "details": details})
+    return tasks
+
+def hashed_embedding(text: str, dims: int = 256) -> list:
+    """
+    Dependency-free stand-in for a sentence embedding: an L2-normalized bag of
+    hashed word unigrams and bigrams. Swap in a local embedding model through
+    GoalPlanCache(embed=...).
+    """
+    words = normalize_goal(text).split()
+    vector = [0.0] * dims
+    for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        vector[zlib.crc32(token.encode("utf-8")) % dims] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class PlanTemplateStore:
+    """
+    Content-addressed plan templates. A template is written to Redis once
+    (`plan_template:<sha256>`) no matter how many jobs use it; jobs only store
+    the template id and their parameters. Keys expire after `ttl` seconds
+    without use: every use by a planner or orchestrator extends the lifetime
+    (at most once per `ttl / 10` per process), so templates of live job
+    shapes stay while one-off shapes (e.g. random external plans) go away.
+    Templates are immutable, so readers keep the `size` most recently used
+    ones in an in-memory LRU.
+    """
+    def __init__(self, redis_client, size: int = None, ttl: int = None):
+        self.redis_client = redis_client
+        self.size = PLAN_TEMPLATE_CACHE_SIZE if size is None else size
+        self.ttl = PLAN_TEMPLATE_TTL_SECONDS if ttl is None else ttl
+        # template_id -> (template_tasks, monotonic time the Redis TTL was last extended)
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"templates_written": 0, "template_reuses": 0, "evictions": 0}
+
+    def _remember(self, template_id, template_tasks):
+        with self._lock:
+            self._templates[template_id] = (template_tasks, time.monotonic())
+            self._templates.move_to_end(template_id)
+            while len(self._templates) > self.size:
+                self._templates.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _cached(self, template_id):
+        """
+        Returns a template from the LRU, extending its Redis TTL when due.
+        """
+        with self._lock:
+            entry = self._templates.get(template_id)
+            if entry is None:
+                return None
+            self._templates.move_to_end(template_id)
+            template_tasks, refreshed = entry
+            due = self.ttl > 0 and time.monotonic() - refreshed > self.ttl / 10
+            if due:
+                self._templates[template_id] = (template_tasks, time.monotonic())
+        if due:
+            self.redis_client.expire(f"{TEMPLATE_PREFIX}{template_id}", self.ttl)
+        return template_tasks
+
+    def put(self, template_tasks: list) -> str:
+        data = _canonical(template_tasks)
+        template_id = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        if self._cached(template_id) is not None:
+            with self._lock:
+                self._stats["template_reuses"] += 1
+            return template_id
+        key = f"{TEMPLATE_PREFIX}{template_id}"
+        pipe = self.redis_client.pipeline(transaction=False)
+        # NX: another planner may already have written the same template; it
+        # then only gets its lifetime extended
+        pipe.set(key, data, nx=True, ex=self.ttl or None)
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+        written = pipe.execute()[0]
+        self._remember(template_id, template_tasks)
+        with self._lock:
+            self._stats["templates_written" if written else "template_reuses"] += 1
+        return template_id
+
+    def get(self, template_id: str):
+        template_tasks = self._cached(template_id)
+        if template_tasks is None:
+            key = f"{TEMPLATE_PREFIX}{template_id}"
+            data = self.redis_client.getex(key, ex=self.ttl) if self.ttl else self.redis_client.get(key)
+            if data is None:
+                return None
+            template_tasks = json.loads(data)
+            self._remember(template_id, template_tasks)
+        return template_tasks
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, templates=len(self._templates))
+
+
+class GoalPlanCache:
+    """
+    Maps goals to the (template id, params) of a plan that was generated for
+    them, so repeated goals skip the LLM entirely. Exact matches use the
+    normalized goal, in a bounded in-process LRU in front of
+    `plancache:<sha256>` hashes in Redis (expiring after `ttl` seconds).
+    With `similarity` > 0 a miss also looks for the most similar cached goal
+    (cosine similarity of `embed(goal)`) among the local entries and returns
+    its template, whose params the planner must then fill in for the new goal;
+    such matches are never stored under the new goal. Local entries expire
+    with the Redis entry they mirror.
+    """
+    def __init__(self, redis_client, size: int = None, ttl: int = None, similarity: float = None, embed=None):
+        self.redis_client = redis_client
+        self.size = PLAN_CACHE_SIZE if size is None else size
+        self.ttl = PLAN_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.similarity = PLAN_CACHE_SIMILARITY if similarity is None else similarity
+        self.embed = embed or hashed_embedding
+        self.logger = logging.getLogger("PlanCache")
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "redis_hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0}
+
+    def _key(self, normalized: str) -> str:
+        return f"{GOAL_CACHE_PREFIX}{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+    def _remember(self, normalized, entry, ttl: float = None):
+        # Kept locally for `ttl` seconds (default: the full cache TTL, if any)
+        ttl = self.ttl if ttl is None else ttl
+        entry["expires_at"] = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._local[normalized] = entry
+            self._local.move_to_end(normalized)
+            while len(self._local) > self.size:
+                self._local.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    @staticmethod
+    def _expired(entry) -> bool:
+        return entry["expires_at"] is not None and entry["expires_at"] <= time.monotonic()
+
+    def _nearest(self, vector):
+        best, best_score = None, self.similarity
+        with self._lock:
+            entries = [entry for entry in self._local.values() if not self._expired(entry)]
+        for entry in entries:
+            score = sum(a * b for a, b in zip(vector, entry["vector"]))
+            if score >= best_score:
+                best, best_score = entry, score
+        return best, best_score
+
+    def lookup(self, goal: str, similar: bool = True):
+        """
+        Returns (template_id, params, exact) for a cached goal, or None.
+        `exact` is False for a similarity match, whose params belong to a
+        different goal; `similar=False` only returns exact matches.
+        """
+        normalized = normalize_goal(goal)
+        with self._lock:
+            entry = self._local.get(normalized)
+            if entry is not None and self._expired(entry):
+                del self._local[normalized]
+                entry = None
+            if entry is not None:
+                self._local.move_to_end(normalized)
+                self._stats["hits"] += 1
+                return entry["template_id"], entry["params"], True
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hmget(self._key(normalized), ["template", "encoding", "params"])
+        pipe.pttl(self._key(normalized))
+        (template_id, encoding, params), pttl = pipe.execute()
+        if template_id is not None:
+            entry = {"template_id": template_id, "params": codec.decode(params, encoding), "vector": self.embed(normalized)}
+            self._remember(normalized, entry, pttl / 1000 if pttl > 0 else None)
+            with self._lock:
+                self._stats["redis_hits"] += 1
+            return entry["template_id"], entry["params"], True
+
+        if similar and self.similarity > 0:
+            entry, score = self._nearest(self.embed(normalized))
+            if entry is not None:
+                self.logger.info(f"Reusing plan template {entry['template_id'][:12]} for a similar goal (similarity {score:.2f}).")
+                with self._lock:
+                    self._stats["similar_hits"] += 1
+                return entry["template_id"], entry["params"], False
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def store(self, goal: str, template_id: str, params: dict):
+        normalized = normalize_goal(goal)
+        self._remember(normalized, {"template_id": template_id, "params": params, "vector": self.embed(normalized)})
+        tag, data = codec.encode(params)
+        key = self._key(normalized)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset(key, mapping={"template": template_id, "encoding": tag, "params": data})
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._local)
+        hits = stats["hits"] + stats["redis_hits"] + stats["similar_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
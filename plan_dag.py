@@ -0,0 +1,229 @@
+# /agentic-ai-system/plan_dag.py
+
+from collections import OrderedDict
+from scheduling import DEFAULT_TENANT, normalize_priority
+from streaming import streamed_sources
+from fan_in import referenced_sources, validate
+
+class CompiledPlan:
+    """
+    A plan compiled once into a DAG with indegree counters and a
+    reverse-dependency (successor) index. Completing a task only touches its
+    direct successors, so driving a job with T tasks costs O(T + E) overall
+    instead of re-scanning the whole plan on every result.
+
+    Ready tasks are returned longest remaining critical path first: `rank` is
+    the summed `cost` (default 1) of the task and its most expensive chain of
+    successors, so the tasks that bound the job's makespan are dispatched
+    (and therefore consumed) ahead of leaf tasks.
+
+    Upstream tasks referenced by a task's details (`result_from:` values and
+    fan-in specs, see fan_in.py) are implied dependencies.
+
+    A detail value `stream_from:<task_id>` makes the edge from that task a
+    streaming edge (and implies the dependency): the consumer reads the
+    producer's chunks as they are written, so it becomes ready as soon as the
+    producer is dispatched rather than when it completes.
+    """
+    def __init__(self, plan: dict):
+        self.job_id = plan.get('job_id')
+        self.goal = plan.get('goal', 'N/A')
+        self.priority = normalize_priority(plan.get('priority'))
+        self.tenant = plan.get('tenant') or DEFAULT_TENANT
+        self.tasks = {}
+        self.successors = {}
+        self.dependencies = {}
+        # task_id -> producers whose chunks it consumes
+        self.streaming = {}
+        self.indegree = {}
+        self.completed = set()
+        self.dispatched = set()
+        self.failed = set()
+        # Producers whose streaming consumers were already released
+        self.started = set()
+        # Set when the state was rebuilt from Redis rather than built from a fresh plan
+        self.recovered = False
+
+        for task in plan['tasks']:
+            task_id = task['task_id']
+            if task_id in self.tasks:
+                raise ValueError(f"Duplicate task_id '{task_id}' in plan for job {self.job_id}.")
+            self.tasks[task_id] = task
+            self.successors[task_id] = []
+
+        for task_id, task in self.tasks.items():
+            details = task.get('details', {})
+            referenced = referenced_sources(details)
+            # An upstream that is also referenced by value (`result_from:`) must complete first
+            streamed = streamed_sources(details) - referenced
+            for value in details.values():
+                validate(value)
+            dependencies = set(task.get('dependencies', [])) | referenced | streamed
+            for dependency in dependencies:
+                if dependency not in self.tasks:
+                    raise ValueError(f"Task '{task_id}' depends on unknown task '{dependency}'.")
+                self.successors[dependency].append(task_id)
+            self.dependencies[task_id] = dependencies
+            self.streaming[task_id] = streamed
+            self.indegree[task_id] = len(dependencies)
+
+        self.final_task_id = plan['tasks'][-1]['task_id'] if plan['tasks'] else None
+        self.rank = self._rank(self._topological_order())
+
+    def _topological_order(self) -> list:
+        indegree = dict(self.indegree)
+        frontier = [task_id for task_id, degree in indegree.items() if degree == 0]
+        order = []
+        while frontier:
+            task_id = frontier.pop()
+            order.append(task_id)
+            for successor in self.successors[task_id]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    frontier.append(successor)
+        if len(order) != len(self.tasks):
+            raise ValueError(f"Plan for job {self.job_id} contains a dependency cycle.")
+        return order
+
+    def _rank(self, order) -> dict:
+        rank = {}
+        for task_id in reversed(order):
+            tail = max((rank[successor] for successor in self.successors[task_id]), default=0)
+            rank[task_id] = float(self.tasks[task_id].get('cost', 1)) + tail
+        return rank
+
+    def _by_rank(self, task_ids) -> list:
+        return sorted(task_ids, key=lambda task_id: -self.rank[task_id])
+
+    @classmethod
+    def from_job_state(cls, plan: dict, job_state: dict) -> "CompiledPlan":
+        """
+        Rebuilds the in-memory state from the durable `task_status:*` fields of
+        the job hash, e.g. after an orchestrator restart or a cache eviction.
+        """
+        compiled = cls(plan)
+        compiled.recovered = True
+        for task_id in compiled.tasks:
+            status = job_state.get(f"task_status:{task_id}")
+            if status == "completed":
+                compiled.complete(task_id)
+            elif status == "dispatched":
+                compiled.mark_dispatched(task_id)
+            elif status == "failed":
+                compiled.failed.add(task_id)
+        return compiled
+
+    def _is_pending(self, task_id) -> bool:
+        return task_id not in self.dispatched and task_id not in self.completed and task_id not in self.failed
+
+    def ready_tasks(self) -> list:
+        """
+        All tasks whose dependencies are satisfied and that have not been
+        dispatched yet. Used to start a job and to catch up after a rebuild.
+        """
+        return self._by_rank(
+            task_id for task_id, degree in self.indegree.items() if degree == 0 and self._is_pending(task_id)
+        )
+
+    def _release(self, task_id, streaming: bool) -> list:
+        ready = []
+        for successor in self.successors[task_id]:
+            if (task_id in self.streaming[successor]) != streaming:
+                continue
+            self.indegree[successor] -= 1
+            if self.indegree[successor] == 0 and self._is_pending(successor):
+                ready.append(successor)
+        return ready
+
+    def _start(self, task_id) -> list:
+        if task_id in self.started:
+            return []
+        self.started.add(task_id)
+        return self._release(task_id, streaming=True)
+
+    def complete(self, task_id) -> list:
+        """
+        Marks a task as completed and returns the successors that became ready.
+        Completing the same task twice is a no-op.
+        """
+        if task_id not in self.tasks or task_id in self.completed:
+            return []
+        # Streaming consumers are normally released at dispatch already
+        ready = self._start(task_id)
+        self.completed.add(task_id)
+        self.dispatched.discard(task_id)
+        ready += self._release(task_id, streaming=False)
+        return self._by_rank(ready)
+
+    def mark_dispatched(self, task_id) -> list:
+        """
+        Marks a task as dispatched and returns the consumers of its chunks that
+        became ready with it.
+        """
+        self.dispatched.add(task_id)
+        return self._by_rank(self._start(task_id))
+
+    def stream_consumers(self, task_id) -> list:
+        return [successor for successor in self.successors[task_id] if task_id in self.streaming[successor]]
+
+    def dispatch_order(self, task_ids) -> list:
+        """
+        `task_ids` plus, transitively, the consumers of their chunks, which are
+        dispatched in the same call: highest rank first, but every producer
+        before its consumers.
+        """
+        closure = list(dict.fromkeys(task_ids))
+        for task_id in closure:
+            closure += [consumer for consumer in self.stream_consumers(task_id) if consumer not in closure]
+        pending, ordered = self._by_rank(closure), []
+        while pending:
+            task_id = next(task_id for task_id in pending if not self.streaming[task_id] & set(pending))
+            pending.remove(task_id)
+            ordered.append(task_id)
+        return ordered
+
+    def streams_output(self, task_id) -> bool:
+        return bool(self.stream_consumers(task_id))
+
+    def dispatch_dependencies(self, task_id) -> list:
+        """
+        The dependencies checked by the dispatch script. Producers of streaming
+        edges are marked `~<task_id>`: they only need to be dispatched.
+        """
+        return sorted(f"~{dependency}" if dependency in self.streaming[task_id] else dependency
+                      for dependency in self.dependencies[task_id])
+
+    def fail(self, task_id):
+        self.dispatched.discard(task_id)
+        self.failed.add(task_id)
+
+    @property
+    def is_complete(self) -> bool:
+        return len(self.completed) == len(self.tasks)
+
+class PlanCache:
+    """
+    A bounded LRU of compiled plans keyed by job_id. Redis stays the source of
+    truth; an evicted plan is simply recompiled on the next access.
+    """
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._plans = OrderedDict()
+
+    def get(self, job_id):
+        compiled = self._plans.get(job_id)
+        if compiled is not None:
+            self._plans.move_to_end(job_id)
+        return compiled
+
+    def put(self, job_id, compiled: CompiledPlan):
+        self._plans[job_id] = compiled
+        self._plans.move_to_end(job_id)
+        while len(self._plans) > self.max_size:
+            self._plans.popitem(last=False)
+
+    def evict(self, job_id):
+        self._plans.pop(job_id, None)
+
+    def __len__(self):
+        return len(self._plans)
@@ -0,0 +1,252 @@
+# /agentic-ai-system/reclaim.py
+
+import os
+import time
+import logging
+from retention import xadd_trim_args
+
+DEAD_LETTER_PREFIX = "deadletter:"
+
+RECLAIM_MIN_IDLE_MS = int(os.getenv("RECLAIM_MIN_IDLE_MS", 60000))
+RECLAIM_MAX_DELIVERIES = int(os.getenv("RECLAIM_MAX_DELIVERIES", 5))
+RECLAIM_BACKOFF_MAX_MS = int(os.getenv("RECLAIM_BACKOFF_MAX_MS", 3600000))
+RECLAIM_INTERVAL = float(os.getenv("RECLAIM_INTERVAL", 10))
+# Pending entries inspected per XPENDING call
+RECLAIM_PAGE_SIZE = int(os.getenv("RECLAIM_PAGE_SIZE", 100))
+
+def _next_id(entry_id: str) -> str:
+    ms, _, seq = entry_id.partition('-')
+    return f"{ms}-{int(seq) + 1}"
+
+class PendingReclaimer:
+    """
+    Recovers messages stranded in a consumer group's Pending Entries List, e.g.
+    because the consumer that read them crashed before XACK.
+
+    A pending message is claimed for `consumer` once it has been idle for
+    `min_idle_ms * 2 ** (deliveries - 1)` (capped at `backoff_max_ms`), so a
+    message that keeps failing is retried with exponential backoff. After
+    `max_deliveries` deliveries it is treated as poison: copied to
+    `deadletter:<stream>` and acknowledged.
+
+    The PEL is read in pages of `page_size` from a per-stream cursor, so
+    entries still backing off never hide claimable entries behind them, and
+    successive calls work through the whole list before starting over.
+    """
+    def __init__(self, redis_client, group: str, consumer: str, min_idle_ms: int = None,
+                 max_deliveries: int = None, backoff_max_ms: int = None, interval: float = None,
+                 page_size: int = None):
+        self.redis_client = redis_client
+        self.group = group
+        self.consumer = consumer
+        self.min_idle_ms = min_idle_ms or RECLAIM_MIN_IDLE_MS
+        self.max_deliveries = max_deliveries or RECLAIM_MAX_DELIVERIES
+        self.backoff_max_ms = backoff_max_ms or RECLAIM_BACKOFF_MAX_MS
+        self.interval = RECLAIM_INTERVAL if interval is None else interval
+        self.page_size = page_size or RECLAIM_PAGE_SIZE
+        self._cursors = {}
+        self.logger = logging.getLogger(f"{group}.reclaimer")
+        self._last_run = time.monotonic()
+
+    def due(self) -> bool:
+        """
+        True once every `interval` seconds; lets run loops call `reclaim` cheaply.
+        """
+        if time.monotonic() - self._last_run < self.interval:
+            return False
+        self._last_run = time.monotonic()
+        return True
+
+    def _required_idle_ms(self, deliveries: int) -> int:
+        return min(self.min_idle_ms * 2 ** max(deliveries - 1, 0), self.backoff_max_ms)
+
+    def _select(self, page: list, count: int, to_claim: dict, poison: list) -> int:
+        """
+        Sorts a page of idle pending entries into `to_claim` (required idle ->
+        message_ids) and `poison` until `count` entries are selected. Entries
+        still backing off are skipped. Returns the number of entries examined.
+        """
+        examined = 0
+        for entry in page:
+            if sum(len(message_ids) for message_ids in to_claim.values()) + len(poison) >= count:
+                break
+            examined += 1
+            deliveries = entry['times_delivered']
+            if deliveries >= self.max_deliveries:
+                poison.append(entry)
+                continue
+            required_idle = self._required_idle_ms(deliveries)
+            if entry['time_since_delivered'] >= required_idle:
+                to_claim.setdefault(required_idle, []).append(entry['message_id'])
+        return examined
+
+    def _advance(self, stream: str, page: list, examined: int):
+        """
+        Moves the cursor of `stream` past the examined part of a page. Returns
+        the start of the next page to read, or None when this call is done.
+        """
+        if examined < len(page):
+            self._cursors[stream] = page[examined]['message_id']
+            return None
+        if len(page) < self.page_size:
+            # End of the PEL: the next call starts from the beginning again
+            self._cursors.pop(stream, None)
+            return None
+        return _next_id(page[-1]['message_id'])
+
+    def _report(self, stream: str, claimed: list, dead: list):
+        if claimed or dead:
+            self.logger.warning(f"Reclaimed {len(claimed)} and dead-lettered {len(dead)} pending messages on {stream}.")
+
+    def reclaim(self, stream: str, count: int = 100):
+        """
+        Selects up to `count` idle pending entries of `stream`, reading the PEL
+        page by page from where the previous call stopped.
+
+        Returns:
+            (claimed, dead) lists of (message_id, fields). `claimed` messages now
+            belong to this consumer and must be processed and acknowledged by the
+            caller; `dead` messages were already dead-lettered and acknowledged.
+        """
+        to_claim, poison = {}, []
+        start = self._cursors.get(stream, '-')
+        while start is not None:
+            page = self.redis_client.xpending_range(
+                stream, self.group, min=start, max='+', count=self.page_size, idle=self.min_idle_ms
+            )
+            start = self._advance(stream, page, self._select(page, count, to_claim, poison))
+
+        claimed = []
+        for required_idle, message_ids in to_claim.items():
+            # XCLAIM re-checks the idle time, so a message claimed concurrently by
+            # another consumer in the meantime is skipped.
+            claimed += self.redis_client.xclaim(stream, self.group, self.consumer, required_idle, message_ids)
+
+        dead = self._dead_letter(stream, poison) if poison else []
+
+        # Entries trimmed from the stream come back without fields; just drop them
+        missing = [message_id for message_id, fields in claimed if not fields]
+        if missing:
+            self.redis_client.xack(stream, self.group, *missing)
+        claimed = [(message_id, fields) for message_id, fields in claimed if fields]
+
+        self._report(stream, claimed, dead)
+        return claimed, dead
+
+    def _keepalive_due(self, state: list) -> bool:
+        # Refreshing at a third of min_idle_ms keeps a live message clear of it
+        now = time.monotonic()
+        if now - state[0] < self.min_idle_ms / 3000:
+            return False
+        state[0] = now
+        return True
+
+    def keepalive(self, stream: str, message_ids: list):
+        """
+        A callable for long waits inside a task (e.g. for an upstream chunk
+        stream) that resets the idle time of `message_ids` with XCLAIM JUSTID,
+        which leaves their delivery counts alone, so other consumers do not
+        reclaim messages that are still being worked on. Calls are rate
+        limited and may be made as often as convenient.
+        """
+        state = [time.monotonic()]
+        def refresh():
+            if self._keepalive_due(state):
+                self.redis_client.xclaim(stream, self.group, self.consumer, 0, message_ids, justid=True)
+        return refresh
+
+    def leave_group(self, streams):
+        """
+        Removes the consumer from the group on each stream unless it still
+        owns pending entries there, which live consumers will reclaim.
+        """
+        for stream in streams:
+            try:
+                pending = self.redis_client.xpending_range(
+                    stream, self.group, min='-', max='+', count=1, consumername=self.consumer
+                )
+                if not pending:
+                    self.redis_client.xgroup_delconsumer(stream, self.group, self.consumer)
+            except Exception as e:
+                self.logger.warning(f"Could not remove consumer '{self.consumer}' from the group on '{stream}': {e}")
+
+    def _queue_dead_letter(self, pipe, stream: str, entry: dict, fields: dict):
+        pipe.xadd(f"{DEAD_LETTER_PREFIX}{stream}", {
+            **fields,
+            'original_id': entry['message_id'],
+            'group': self.group,
+            'deliveries': entry['times_delivered'],
+        }, **xadd_trim_args())
+        pipe.xack(stream, self.group, entry['message_id'])
+
+    def _dead_letter(self, stream: str, entries: list) -> list:
+        dead = []
+        pipe = self.redis_client.pipeline(transaction=False)
+        for entry in entries:
+            message_id = entry['message_id']
+            messages = self.redis_client.xrange(stream, min=message_id, max=message_id)
+            fields = messages[0][1] if messages else {}
+            self._queue_dead_letter(pipe, stream, entry, fields)
+            if fields:
+                dead.append((message_id, fields))
+        pipe.execute()
+        return dead
+
+
+class AsyncPendingReclaimer(PendingReclaimer):
+    """
+    asyncio variant of PendingReclaimer for AsyncBaseAgent.
+    """
+    async def reclaim(self, stream: str, count: int = 100):
+        to_claim, poison = {}, []
+        start = self._cursors.get(stream, '-')
+        while start is not None:
+            page = await self.redis_client.xpending_range(
+                stream, self.group, min=start, max='+', count=self.page_size, idle=self.min_idle_ms
+            )
+            start = self._advance(stream, page, self._select(page, count, to_claim, poison))
+
+        claimed = []
+        for required_idle, message_ids in to_claim.items():
+            claimed += await self.redis_client.xclaim(stream, self.group, self.consumer, required_idle, message_ids)
+
+        dead = await self._dead_letter(stream, poison) if poison else []
+
+        missing = [message_id for message_id, fields in claimed if not fields]
+        if missing:
+            await self.redis_client.xack(stream, self.group, *missing)
+        claimed = [(message_id, fields) for message_id, fields in claimed if fields]
+
+        self._report(stream, claimed, dead)
+        return claimed, dead
+
+    def keepalive(self, stream: str, message_ids: list):
+        state = [time.monotonic()]
+        async def refresh():
+            if self._keepalive_due(state):
+                await self.redis_client.xclaim(stream, self.group, self.consumer, 0, message_ids, justid=True)
+        return refresh
+
+    async def leave_group(self, streams):
+        for stream in streams:
+            try:
+                pending = await self.redis_client.xpending_range(
+                    stream, self.group, min='-', max='+', count=1, consumername=self.consumer
+                )
+                if not pending:
+                    await self.redis_client.xgroup_delconsumer(stream, self.group, self.consumer)
+            except Exception as e:
+                self.logger.warning(f"Could not remove consumer '{self.consumer}' from the group on '{stream}': {e}")
+
+    async def _dead_letter(self, stream: str, entries: list) -> list:
+        dead = []
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for entry in entries:
+                message_id = entry['message_id']
+                messages = await self.redis_client.xrange(stream, min=message_id, max=message_id)
+                fields = messages[0][1] if messages else {}
+                self._queue_dead_letter(pipe, stream, entry, fields)
+                if fields:
+                    dead.append((message_id, fields))
+            await pipe.execute()
+        return dead
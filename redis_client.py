@@ -1,28 +1,140 @@
 
-import redis
 import os
+import logging
+import threading
+import redis
+import redis.asyncio
+
+logger = logging.getLogger("redis_client")
 
 # It's good practice to use environment variables for configuration
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "mypassword")
 
-# Create a reusable connection pool
-redis_pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, password=REDIS_PASSWORD, db=0, decode_responses=True)
+# Connections per pool and process; callers wait up to REDIS_POOL_TIMEOUT for a free one
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 20))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 5))
+# 0 disables the read timeout; blocking commands are issued in slices of MAX_BLOCK_SECONDS
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 30))
+REDIS_SOCKET_KEEPALIVE = os.getenv("REDIS_SOCKET_KEEPALIVE", "1") == "1"
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+
+# Longest single blocking call (BLPOP, XREAD BLOCK) that stays clear of the socket timeout
+MAX_BLOCK_SECONDS = max(1.0, REDIS_SOCKET_TIMEOUT / 2) if REDIS_SOCKET_TIMEOUT > 0 else 10.0
+
+
+def _connection_kwargs(decode_responses: bool) -> dict:
+    return {
+        "host": REDIS_HOST,
+        "port": REDIS_PORT,
+        "password": REDIS_PASSWORD,
+        "db": 0,
+        "decode_responses": decode_responses,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT or None,
+        "socket_connect_timeout": REDIS_CONNECT_TIMEOUT or None,
+        "socket_keepalive": REDIS_SOCKET_KEEPALIVE,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+class ConnectionManager:
+    """
+    Per-process Redis connection pools. Pools are created on first use, so
+    importing this module opens no connection, and they are rebuilt when the
+    manager is used from a different process than the one that created them
+    (e.g. a `multiprocessing` child forked by the supervisor), so processes
+    never share sockets. Each pool is a BlockingConnectionPool capped at
+    `max_connections`: when every connection is busy, callers wait up to
+    `timeout` seconds for one instead of opening more sockets.
+    """
+    def __init__(self, max_connections: int = None, timeout: float = None):
+        self.max_connections = max_connections or REDIS_MAX_CONNECTIONS
+        self.timeout = REDIS_POOL_TIMEOUT if timeout is None else timeout
+        self._pools = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # Forked: drop the parent's pools without closing them (their
+            # sockets belong to the parent) and any lock held at fork time.
+            self._pid = os.getpid()
+            self._pools = {}
+            self._lock = threading.Lock()
+
+    def pool(self, decode_responses: bool = True) -> redis.BlockingConnectionPool:
+        self._check_pid()
+        pool = self._pools.get(decode_responses)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(decode_responses)
+                if pool is None:
+                    pool = redis.BlockingConnectionPool(
+                        max_connections=self.max_connections, timeout=self.timeout,
+                        **_connection_kwargs(decode_responses)
+                    )
+                    self._pools[decode_responses] = pool
+        return pool
+
+    def async_pool(self, decode_responses: bool = True) -> redis.asyncio.BlockingConnectionPool:
+        """
+        A new capped asyncio pool. asyncio connections are bound to the event
+        loop that opens them, so these are not shared between callers.
+        """
+        return redis.asyncio.BlockingConnectionPool(
+            max_connections=self.max_connections, timeout=self.timeout, **_connection_kwargs(decode_responses)
+        )
+
+    def reset(self):
+        """
+        Closes this process's pools; the next client call creates new ones.
+        """
+        self._check_pid()
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.disconnect()
+
+
+connections = ConnectionManager()
 
 def get_redis_client():
     """
     Returns a Redis client instance from the connection pool.
     """
-    return redis.Redis(connection_pool=redis_pool)
+    return redis.Redis(connection_pool=connections.pool(decode_responses=True))
 
-# A client instance for general use
-redis_client = get_redis_client()
+def get_binary_redis_client():
+    """
+    Returns a Redis client that returns raw bytes instead of decoded strings.
+    """
+    return redis.Redis(connection_pool=connections.pool(decode_responses=False))
 
-# Ensure the server is connected
-try:
-    redis_client.ping()
-    print("Successfully connected to Redis.")
-except redis.exceptions.ConnectionError as e:
-    print(f"Could not connect to Redis: {e}")
-    print("Please ensure Redis is running and accessible at {REDIS_HOST}:{REDIS_PORT}")
\ No newline at end of file
+def get_async_redis_client():
+    """
+    Returns an asyncio Redis client. Its connections are opened lazily on the
+    event loop that first uses them, so call this from inside that loop.
+    Closing the client closes its pool.
+    """
+    return redis.asyncio.Redis.from_pool(connections.async_pool(decode_responses=True))
+
+def get_async_binary_redis_client():
+    """
+    asyncio counterpart of `get_binary_redis_client`.
+    """
+    return redis.asyncio.Redis.from_pool(connections.async_pool(decode_responses=False))
+
+def check_connection(client=None) -> bool:
+    """
+    Pings Redis and logs the outcome. Nothing connects at import time, so
+    entry points call this to fail fast on a wrong address.
+    """
+    try:
+        (client or get_redis_client()).ping()
+        logger.info(f"Connected to Redis at {REDIS_HOST}:{REDIS_PORT}.")
+        return True
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Could not connect to Redis at {REDIS_HOST}:{REDIS_PORT}: {e}")
+        return False
@@ -0,0 +1,177 @@
+# /agentic-ai-system/retention.py
+
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+
+# Approximate length cap of streams (0 disables it). Log-like streams without a
+# consumer group (dead letters) are capped on XADD; work queues are trimmed
+# periodically, and only of entries every consumer group has acknowledged.
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", 100000))
+# Acknowledged queue entries older than this are trimmed periodically; 0 disables it
+STREAM_MAX_AGE_SECONDS = int(os.getenv("STREAM_MAX_AGE_SECONDS", 0))
+# Lifetime of completed / failed job hashes; 0 keeps them forever
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", 24 * 3600))
+# Finished jobs are archived here before they expire; empty disables archival
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_SEGMENT_RECORDS = int(os.getenv("ARCHIVE_SEGMENT_RECORDS", 10000))
+
+def xadd_trim_args() -> dict:
+    """
+    Keyword arguments for redis-py `xadd` that bound the stream length. Only
+    for streams nobody consumes through a group: MAXLEN does not look at
+    consumer-group progress and would drop undelivered entries of a queue.
+    """
+    if STREAM_MAXLEN <= 0:
+        return {}
+    return {"maxlen": STREAM_MAXLEN, "approximate": True}
+
+def _parse_id(entry_id: str) -> tuple:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+def unlink_matching(redis_client, patterns, batch_size: int = 500) -> int:
+    """
+    Deletes every key matching the given patterns with non-blocking UNLINK,
+    in pipelined batches driven by SCAN. Returns the number of keys removed.
+    """
+    removed = 0
+    batch = []
+    for pattern in patterns:
+        for key in redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                removed += redis_client.unlink(*batch)
+                batch = []
+    if batch:
+        removed += redis_client.unlink(*batch)
+    return removed
+
+class JobArchiver:
+    """
+    Appends finished jobs as JSON lines to gzip-compressed segment files
+    (`jobs-<timestamp>-<pid>-<ms>.jsonl.gz`), starting a new segment every
+    `segment_records` jobs. Each record is written as its own gzip member, so a
+    segment stays readable (`zcat`) even if the process dies mid-segment.
+    """
+    def __init__(self, directory: str = None, segment_records: int = None):
+        self.directory = ARCHIVE_DIR if directory is None else directory
+        self.segment_records = segment_records or ARCHIVE_SEGMENT_RECORDS
+        self.logger = logging.getLogger("JobArchiver")
+        self._lock = threading.Lock()
+        self._segment_path = None
+        self._records = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def _next_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._segment_path = os.path.join(
+            self.directory, f"jobs-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{int(time.time() * 1000) % 1000:03d}.jsonl.gz"
+        )
+        self._records = 0
+        self.logger.info(f"Archiving finished jobs to {self._segment_path}")
+
+    def archive(self, job_id: str, job_state: dict):
+        if not self.enabled:
+            return
+        record = json.dumps({"job_id": job_id, "archived_at": time.time(), "state": job_state}, ensure_ascii=False)
+        with self._lock:
+            if self._segment_path is None or self._records >= self.segment_records:
+                self._next_segment()
+            with gzip.open(self._segment_path, "at", encoding="utf-8") as segment:
+                segment.write(record + "\n")
+            self._records += 1
+
+class RetentionManager:
+    """
+    Bounds Redis memory: archives and expires finished job hashes, and trims
+    streams by age (MINID) on top of the per-XADD MAXLEN cap.
+    """
+    def __init__(self, redis_client, archiver: JobArchiver = None, job_ttl: int = None, max_age: int = None):
+        self.redis_client = redis_client
+        self.archiver = archiver or JobArchiver()
+        self.job_ttl = JOB_TTL_SECONDS if job_ttl is None else job_ttl
+        self.max_age = STREAM_MAX_AGE_SECONDS if max_age is None else max_age
+        self.logger = logging.getLogger("RetentionManager")
+
+    def finish_job(self, job_id: str, job_state: dict):
+        """
+        Archives a completed or failed job and schedules its hash for expiry.
+        """
+        try:
+            self.archiver.archive(job_id, job_state)
+        except Exception as e:
+            # Keep the hash rather than lose the only copy of the job
+            self.logger.error(f"Could not archive job {job_id}; leaving it in Redis: {e}", exc_info=True)
+            return
+        if self.job_ttl > 0:
+            self.redis_client.expire(f"job:{job_id}", self.job_ttl)
+
+    def consumed_floors(self, streams) -> dict:
+        """
+        Returns stream -> the lowest entry ID any of its consumer groups may
+        still need: the oldest pending entry, or the entry after the last one
+        delivered. Everything below it has been acknowledged by every group.
+        Streams without a group are left out; nothing of them is consumed yet.
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for stream in streams:
+            pipe.xinfo_groups(stream)
+        groups = {}
+        for stream, reply in zip(streams, pipe.execute(raise_on_error=False)):
+            # Missing streams answer with an error
+            if reply and not isinstance(reply, Exception):
+                groups[stream] = reply
+
+        pending = [(stream, group["name"]) for stream, infos in groups.items() for group in infos if group["pending"]]
+        pipe = self.redis_client.pipeline(transaction=False)
+        for stream, group_name in pending:
+            pipe.xpending(stream, group_name)
+        oldest_pending = {key: reply["min"] for key, reply in zip(pending, pipe.execute()) if reply.get("min")}
+
+        floors = {}
+        for stream, infos in groups.items():
+            bounds = []
+            for group in infos:
+                ms, seq = _parse_id(group["last-delivered-id"])
+                bounds.append((ms, seq + 1))
+                if (stream, group["name"]) in oldest_pending:
+                    bounds.append(_parse_id(oldest_pending[(stream, group["name"])]))
+            floors[stream] = min(bounds)
+        return floors
+
+    def trim_streams(self, streams):
+        """
+        Trims the acknowledged entries of consumer-group streams (work queues)
+        that are older than `max_age` seconds, and all of them on streams
+        longer than STREAM_MAXLEN. Pending and undelivered entries are never
+        trimmed, however large the backlog.
+        """
+        streams = list(streams)
+        if not streams or (self.max_age <= 0 and STREAM_MAXLEN <= 0):
+            return
+        floors = self.consumed_floors(streams)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for stream in floors:
+            pipe.xlen(stream)
+        lengths = dict(zip(floors, pipe.execute()))
+
+        age_bound = (int((time.time() - self.max_age) * 1000), 0) if self.max_age > 0 else None
+        pipe = self.redis_client.pipeline(transaction=False)
+        for stream, floor in floors.items():
+            if 0 < STREAM_MAXLEN < lengths[stream]:
+                bound = floor
+            elif age_bound is not None:
+                bound = min(floor, age_bound)
+            else:
+                continue
+            pipe.xtrim(stream, minid=f"{bound[0]}-{bound[1]}", approximate=True)
+        trimmed = sum(pipe.execute())
+        if trimmed:
+            self.logger.info(f"Trimmed {trimmed} acknowledged entries from {len(floors)} streams.")
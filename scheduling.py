@@ -0,0 +1,210 @@
+# /agentic-ai-system/scheduling.py
+
+import os
+import time
+import logging
+
+# Job priority classes, highest first. Tasks of `default` jobs keep using the
+# plain `tasks:<agent>` stream; the other classes get `tasks:<agent>:<priority>`.
+PRIORITY_CLASSES = ("interactive", "default", "batch")
+DEFAULT_PRIORITY = "default"
+DEFAULT_TENANT = "default"
+
+TENANT_PREFIX = "tenant:"
+TENANT_MAX_RUNNING_JOBS = int(os.getenv("TENANT_MAX_RUNNING_JOBS", 0))
+# Admission slots of jobs that never finished (e.g. expired) are reclaimed after this
+ADMISSION_SLOT_TTL = int(os.getenv("ADMISSION_SLOT_TTL", 3600))
+
+
+def _parse_weights(spec: str) -> dict:
+    weights = {priority: 1 for priority in PRIORITY_CLASSES}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        priority, _, weight = item.partition("=")
+        if priority not in weights:
+            raise ValueError(f"Unknown priority class '{priority}' in TASK_PRIORITY_WEIGHTS.")
+        weights[priority] = max(0, int(weight))
+    return weights
+
+PRIORITY_WEIGHTS = _parse_weights(os.getenv("TASK_PRIORITY_WEIGHTS", "interactive=8,default=4,batch=1"))
+
+def normalize_priority(priority) -> str:
+    return priority if priority in PRIORITY_CLASSES else DEFAULT_PRIORITY
+
+def priority_streams(task_stream: str) -> dict:
+    """
+    The per-priority variants of an agent's task stream, highest priority
+    first, e.g. {"interactive": "tasks:web_search:interactive",
+    "default": "tasks:web_search", "batch": "tasks:web_search:batch"}.
+    """
+    return {
+        priority: task_stream if priority == DEFAULT_PRIORITY else f"{task_stream}:{priority}"
+        for priority in PRIORITY_CLASSES
+    }
+
+def task_stream(agent_name: str, priority: str = None) -> str:
+    return priority_streams(f"tasks:{agent_name}")[normalize_priority(priority)]
+
+
+class WeightedRoundRobin:
+    """
+    Smooth weighted round robin over the priority classes. `quotas(n)` splits
+    the next `n` reads so that, over time, each class gets a share of reads
+    proportional to its weight while no class waits more than a few rounds,
+    even when `n` is 1.
+    """
+    def __init__(self, weights: dict = None):
+        self.weights = dict(weights or PRIORITY_WEIGHTS)
+        self.total = sum(self.weights.values()) or 1
+        self._current = {priority: 0 for priority in self.weights}
+
+    def quotas(self, n: int) -> dict:
+        counts = {priority: 0 for priority in self.weights}
+        for _ in range(n):
+            for priority, weight in self.weights.items():
+                self._current[priority] += weight
+            chosen = max(self._current, key=self._current.get)
+            self._current[chosen] -= self.total
+            counts[chosen] += 1
+        return counts
+
+    def plan_read(self, task_streams: dict, limit: int) -> "PriorityRead":
+        return PriorityRead(task_streams, self.quotas(limit), limit)
+
+
+def split_reply(reply) -> tuple:
+    """
+    Flattens an XREADGROUP reply into (messages, sources), where `sources`
+    holds the stream each message was read from.
+    """
+    return ([message for _, msg_list in reply or [] for message in msg_list],
+            [stream for stream, msg_list in reply or [] for _ in msg_list])
+
+
+class PriorityRead:
+    """
+    The plan of one batch read of up to `limit` tasks across the priority
+    streams, shared by both agent runtimes, which only issue the reads: one
+    non-blocking read per class with its weighted quota (`initial_reads`,
+    pipelined), then top-ups from the classes that filled their quota while
+    the batch is still short (`top_ups`), highest priority first. Replies are
+    fed back with `add`. When every class came back `empty`, the runtime
+    waits with a blocking read on all streams instead.
+    """
+    def __init__(self, task_streams: dict, quotas: dict, limit: int):
+        self.task_streams = task_streams
+        self.quotas = quotas
+        self.limit = limit
+        self.replies = {priority: [] for priority in task_streams}
+
+    def initial_reads(self) -> list:
+        """
+        (priority, stream, count) for every class with a quota this round.
+        """
+        return [(priority, stream, self.quotas[priority])
+                for priority, stream in self.task_streams.items() if self.quotas[priority] > 0]
+
+    def add(self, priority: str, reply):
+        self.replies[priority].extend(split_reply(reply)[0])
+
+    @property
+    def spare(self) -> int:
+        return self.limit - sum(len(messages) for messages in self.replies.values())
+
+    @property
+    def empty(self) -> bool:
+        return self.spare == self.limit
+
+    def top_ups(self):
+        """
+        Yields (priority, stream, count) follow-up reads; the reply of each
+        must be added before the next one is taken.
+        """
+        for priority, stream in self.task_streams.items():
+            if self.spare <= 0:
+                return
+            if len(self.replies[priority]) < self.quotas[priority]:
+                continue  # drained
+            yield priority, stream, self.spare
+
+    def batch(self) -> tuple:
+        """
+        The (messages, sources) read, in priority order.
+        """
+        return ([message for messages in self.replies.values() for message in messages],
+                [self.task_streams[priority] for priority, messages in self.replies.items() for _ in messages])
+
+
+# Admits a job if its tenant has a free slot, otherwise queues it.
+# KEYS[1] tenant's running-jobs zset, KEYS[2] tenant's admission queue
+# ARGV: job_id, now, max_running, slot_ttl
+ADMIT_LUA = """
+local now = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - tonumber(ARGV[4]))
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 1
+end
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], now, ARGV[1])
+    return 1
+end
+redis.call('RPUSH', KEYS[2], ARGV[1])
+return 0
+"""
+
+# Frees a finished job's slot and admits the tenant's next queued job, if any.
+# Same KEYS and ARGV as ADMIT_LUA; returns the admitted job_id or false.
+RELEASE_LUA = """
+local now = tonumber(ARGV[2])
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - tonumber(ARGV[4]))
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    local next_job = redis.call('LPOP', KEYS[2])
+    if next_job then
+        redis.call('ZADD', KEYS[1], now, next_job)
+        return next_job
+    end
+end
+return false
+"""
+
+class AdmissionController:
+    """
+    Per-tenant admission control. A tenant runs at most `max_running` jobs at
+    once (TENANT_MAX_RUNNING_JOBS, overridable per tenant with
+    TENANT_MAX_RUNNING_JOBS_<TENANT>); further jobs wait in a FIFO queue and
+    are admitted as the tenant's running jobs finish, so one tenant's burst
+    queues behind itself instead of flooding the task streams for everyone.
+    `max_running` 0 admits everything without touching Redis.
+    """
+    def __init__(self, redis_client, max_running: int = None, slot_ttl: int = None):
+        self.redis_client = redis_client
+        self.max_running = TENANT_MAX_RUNNING_JOBS if max_running is None else max_running
+        self.slot_ttl = ADMISSION_SLOT_TTL if slot_ttl is None else slot_ttl
+        self.logger = logging.getLogger("Admission")
+        self._admit = redis_client.register_script(ADMIT_LUA)
+        self._release = redis_client.register_script(RELEASE_LUA)
+
+    def limit_for(self, tenant: str) -> int:
+        return int(os.getenv(f"TENANT_MAX_RUNNING_JOBS_{tenant.upper()}", self.max_running))
+
+    def _keys(self, tenant):
+        return [f"{TENANT_PREFIX}{tenant}:running", f"{TENANT_PREFIX}{tenant}:queue"]
+
+    def admit(self, tenant: str, job_id: str) -> bool:
+        """
+        Returns True when the job may start now; otherwise it was queued.
+        """
+        limit = self.limit_for(tenant)
+        if limit <= 0:
+            return True
+        return bool(self._admit(keys=self._keys(tenant), args=[job_id, time.time(), limit, self.slot_ttl]))
+
+    def release(self, tenant: str, job_id: str):
+        """
+        Frees the slot of a finished job. Returns the job_id of the tenant's
+        next queued job, which now holds the slot and must be started, or None.
+        """
+        limit = self.limit_for(tenant)
+        if limit <= 0:
+            return None
+        return self._release(keys=self._keys(tenant), args=[job_id, time.time(), limit, self.slot_ttl])
@@ -0,0 +1,148 @@
+# /agentic-ai-system/state_scripts.py
+
+# Atomically records a task result and dispatches the tasks it unblocked.
+#
+# KEYS[1]  job hash (job:<id>)
+# KEYS[2..] the task streams candidates may be XADDed to, each listed once
+# ARGV[1]  completed task_id, or "" when only dispatching (job start/recovery)
+# ARGV[2]  result of the completed task
+# ARGV[3]  codec tag of the result (see codec.py)
+# ARGV[4]  new job status, or "" to leave it unchanged
+# ARGV[5]  number of tasks in the plan, or 0 to skip the completion check
+# ARGV[6]  number of candidate tasks, followed for each candidate by:
+#          task_id, index of its stream in KEYS, n_deps, dep_1..dep_n,
+#          n_fields, field_1, value_1, ...
+#
+# A candidate is only XADDed when it has no task_status yet and all of its
+# dependencies are completed (`~<task_id>` dependencies, the producers of
+# streaming edges, only need to be dispatched), which makes dispatch
+# idempotent across concurrent orchestrators. Readiness is decided from the
+# job hash, not from the caller's view of the DAG, so orchestrators with a
+# stale view neither double-dispatch nor miss a task. A candidate without
+# fields is a probe: it is never XADDed, only reported when it is ready
+# (the caller could not build its payload yet).
+#
+# Completions are counted in the `completed_tasks` field; the job is marked
+# completed when the count reaches ARGV[5]. Returns {recorded, dispatched,
+# ready_probes, job_completed}; recorded is 0 when the completion was a
+# duplicate. Task streams are work queues and are not capped on XADD (see
+# RetentionManager.trim_streams).
+TRANSITION_LUA = """
+local job = KEYS[1]
+local completed_task = ARGV[1]
+local recorded = 1
+local job_completed = 0
+
+if ARGV[4] ~= '' then
+    redis.call('HSET', job, 'status', ARGV[4])
+end
+
+if completed_task ~= '' then
+    if redis.call('HGET', job, 'task_status:' .. completed_task) == 'completed' then
+        recorded = 0
+    else
+        redis.call('HSET', job, 'result:' .. completed_task, ARGV[2],
+                   'result_encoding:' .. completed_task, ARGV[3],
+                   'task_status:' .. completed_task, 'completed')
+        local count = redis.call('HINCRBY', job, 'completed_tasks', 1)
+        if count == tonumber(ARGV[5]) then
+            redis.call('HSET', job, 'status', 'completed')
+            job_completed = 1
+        end
+    end
+end
+
+local dispatched = {}
+local probes = {}
+local i = 7
+for _ = 1, tonumber(ARGV[6]) do
+    local task_id = ARGV[i]
+    local stream = KEYS[tonumber(ARGV[i + 1])]
+    local n_deps = tonumber(ARGV[i + 2])
+    i = i + 3
+
+    local ready = not redis.call('HGET', job, 'task_status:' .. task_id)
+    for d = 0, n_deps - 1 do
+        if ready then
+            local dep = ARGV[i + d]
+            if string.sub(dep, 1, 1) == '~' then
+                local status = redis.call('HGET', job, 'task_status:' .. string.sub(dep, 2))
+                ready = status == 'dispatched' or status == 'completed'
+            else
+                ready = redis.call('HGET', job, 'task_status:' .. dep) == 'completed'
+            end
+        end
+    end
+    i = i + n_deps
+
+    local n_fields = tonumber(ARGV[i])
+    i = i + 1
+    if ready and n_fields == 0 then
+        probes[#probes + 1] = task_id
+    elseif ready then
+        local fields = {}
+        for f = 0, 2 * n_fields - 1 do
+            fields[#fields + 1] = ARGV[i + f]
+        end
+        redis.call('XADD', stream, '*', unpack(fields))
+        redis.call('HSET', job, 'task_status:' .. task_id, 'dispatched')
+        dispatched[#dispatched + 1] = task_id
+    end
+    i = i + 2 * n_fields
+end
+
+return {recorded, dispatched, probes, job_completed}
+"""
+
+class JobStateScripts:
+    """
+    Server-side job state machine. Registers the Lua scripts once per client;
+    redis-py runs them with EVALSHA and reloads them transparently when the
+    script cache is flushed.
+    """
+    def __init__(self, redis_client):
+        self._transition = redis_client.register_script(TRANSITION_LUA)
+
+    def transition(self, job_id, candidates, completed_task=None, result="", result_encoding="", job_status=None,
+                   task_count: int = 0):
+        """
+        Runs one atomic state transition for a job.
+
+        Args:
+            job_id: The job whose hash is updated.
+            candidates: (task_id, stream, dependencies, payload) tuples for the
+                tasks that should be dispatched if they are ready, producers
+                before the consumers of their chunks. An empty payload only
+                probes whether the task is ready.
+            completed_task: task_id whose result is being recorded, if any.
+            result: The serialized result of `completed_task`.
+            result_encoding: The codec tag of `result`.
+            job_status: Optional new value for the job's `status` field.
+            task_count: Number of tasks in the plan; the job is marked
+                completed once that many completions were recorded.
+
+        Returns:
+            (recorded, dispatched, ready_probes, job_completed) where
+            `recorded` is False for a duplicate completion, `dispatched` lists
+            the task_ids that were XADDed, `ready_probes` the probed task_ids
+            that are ready, and `job_completed` is True when this completion
+            was the job's last.
+        """
+        args = [
+            completed_task or "",
+            result if completed_task else "",
+            result_encoding or "",
+            job_status or "",
+            task_count,
+            len(candidates),
+        ]
+        # Every key the script touches is declared; candidates refer to their stream by KEYS index
+        keys = [f"job:{job_id}"]
+        for task_id, stream, dependencies, payload in candidates:
+            if stream not in keys:
+                keys.append(stream)
+            args += [task_id, keys.index(stream) + 1, len(dependencies), *dependencies, len(payload)]
+            for field, value in payload.items():
+                args += [field, value]
+        recorded, dispatched, probes, job_completed = self._transition(keys=keys, args=args)
+        return bool(recorded), list(dispatched), list(probes), bool(job_completed)
@@ -0,0 +1,297 @@
+# /agentic-ai-system/streaming.py
+
+import os
+import time
+import uuid
+import asyncio
+import codec
+from redis_client import MAX_BLOCK_SECONDS
+
+# Incremental output of a task is appended to `chunks:<job_id>:<task_id>`
+CHUNK_PREFIX = "chunks:"
+# Marker of a task detail value that consumes another task's chunks as they are produced
+STREAM_FROM_PREFIX = "stream_from:"
+
+CHUNK_TTL_SECONDS = int(os.getenv("CHUNK_TTL_SECONDS", 3600))
+# Once its producer started writing, a consumer gives up when no chunk arrived
+# for this many seconds. Before that it waits as long as the producer is queued.
+CHUNK_READ_TIMEOUT = float(os.getenv("CHUNK_READ_TIMEOUT", 300))
+# A consumer reruns at most this many times when its producer is retried mid-read
+CHUNK_MAX_RESTARTS = int(os.getenv("CHUNK_MAX_RESTARTS", 3))
+
+
+def chunk_stream(job_id: str, task_id: str) -> str:
+    return f"{CHUNK_PREFIX}{job_id}:{task_id}"
+
+def is_stream_ref(value) -> bool:
+    return isinstance(value, str) and value.startswith(STREAM_FROM_PREFIX)
+
+def stream_source(value: str) -> str:
+    """
+    The producing task of a `stream_from:<task_id>` reference.
+    """
+    return value[len(STREAM_FROM_PREFIX):]
+
+def streamed_sources(details: dict) -> set:
+    return {stream_source(value) for value in details.values() if is_stream_ref(value)}
+
+def result_text(result):
+    """
+    The part of a task result that is handed on to dependent tasks.
+    """
+    if not isinstance(result, dict):
+        return result
+    return result.get('content') or result.get('summary')
+
+def combine_chunks(chunks: list):
+    """
+    Reassembles a streamed value: text chunks are concatenated, anything else
+    is returned as the list of chunks.
+    """
+    if all(isinstance(chunk, str) for chunk in chunks):
+        return "".join(chunks)
+    return list(chunks)
+
+class ChunkStreamRestarted(Exception):
+    """
+    Raised by `iter_chunks` when the producer was retried after the consumer
+    had already received chunks of its previous attempt.
+    """
+
+
+def queue_start(pipe, stream: str, attempt: str, ttl: int = None):
+    pipe.xadd(stream, {"start": attempt})
+    pipe.expire(stream, ttl or CHUNK_TTL_SECONDS)
+
+def queue_chunk(pipe, stream: str, chunk, ttl: int = None, attempt: str = None):
+    tag, data = codec.encode(chunk)
+    fields = {"chunk": data, codec.ENCODING_FIELD: tag}
+    if attempt is not None:
+        fields["attempt"] = attempt
+    pipe.xadd(stream, fields)
+    pipe.expire(stream, ttl or CHUNK_TTL_SECONDS)
+
+def queue_end(pipe, stream: str, result=None, error: Exception = None, ttl: int = None, attempt: str = None):
+    """
+    Queues the end marker of a chunk stream on a (sync or asyncio) pipeline.
+    A `result` given here is published first as the only chunk, for tasks
+    that finished without streaming (non-generator agents, cache hits).
+    Without the `attempt` of a ChunkWriter, a completed output is published
+    as an attempt of its own.
+    """
+    if error is not None:
+        pipe.xadd(stream, {"end": "failed", "error": str(error)})
+    else:
+        if attempt is None:
+            attempt = uuid.uuid4().hex
+            queue_start(pipe, stream, attempt, ttl)
+        if result is not None:
+            queue_chunk(pipe, stream, result_text(result), ttl, attempt)
+        pipe.xadd(stream, {"end": "completed", "attempt": attempt})
+    pipe.expire(stream, ttl or CHUNK_TTL_SECONDS)
+
+
+class _ChunkReader:
+    """
+    Read state of one chunk stream, shared by the sync and asyncio readers.
+
+    A consumer is dispatched together with its producer, which may still sit
+    in a task stream backlog, so no deadline applies until the chunk stream
+    exists. Until then, every empty read checks the job: the reader gives up
+    when the job failed, or when the producer finished without a chunk stream
+    (e.g. it expired). Once chunks flow, `timeout` bounds the gap between them.
+
+    Every attempt of the producer opens with a start marker and tags its
+    chunks, so the reader follows the latest attempt and skips the output of
+    earlier ones. A failed end marker fails the read whatever its attempt.
+    """
+    def __init__(self, job_id: str, task_id: str, timeout: float = None):
+        self.job_id = job_id
+        self.task_id = task_id
+        self.stream = chunk_stream(job_id, task_id)
+        self.timeout = CHUNK_READ_TIMEOUT if timeout is None else timeout
+        self.last_id = "0-0"
+        self.deadline = None
+        self.producer_done = False
+        self.attempt = None
+
+    def block_ms(self) -> int:
+        remaining = MAX_BLOCK_SECONDS if self.deadline is None else min(MAX_BLOCK_SECONDS, self.deadline - time.monotonic())
+        return max(1, int(remaining * 1000))
+
+    def feed(self, reply):
+        """
+        Takes an XREAD reply. Returns (chunks, ended, restarted), where
+        `restarted` means the chunks replace everything received before, or
+        None when nothing arrived and the caller must `check_job` before
+        waiting again.
+        """
+        entries = [entry for _, stream_entries in reply or [] for entry in stream_entries]
+        if not entries:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                raise TimeoutError(f"No chunk arrived on {self.stream} within {self.timeout}s.")
+            return None
+        self.last_id = entries[-1][0]
+        self.deadline = time.monotonic() + self.timeout
+
+        chunks, restarted = [], False
+        for _, fields in entries:
+            if "start" in fields:
+                restarted = restarted or self.attempt is not None
+                self.attempt = fields["start"]
+                chunks = []
+            elif "end" in fields:
+                if fields["end"] == "failed":
+                    raise RuntimeError(f"Upstream task of {self.stream} failed: {fields.get('error')}")
+                if fields.get("attempt") == self.attempt:
+                    return chunks, True, restarted
+            elif fields.get("attempt") == self.attempt:
+                chunks.append(codec.decode(fields["chunk"], fields.get(codec.ENCODING_FIELD)))
+        return chunks, False, restarted
+
+    @property
+    def waiting_for_producer(self) -> bool:
+        return self.deadline is None
+
+    def job_fields(self) -> tuple:
+        return f"job:{self.job_id}", ["status", f"task_status:{self.task_id}"]
+
+    def check_job(self, job_status, producer_status):
+        """
+        Raises when waiting for the producer to start is pointless. A finished
+        producer gets one more read, since its chunks may have been written
+        after the last one.
+        """
+        if job_status == "failed":
+            raise RuntimeError(f"Job {self.job_id} failed while waiting for the output of task {self.task_id}.")
+        if producer_status in ("completed", "failed"):
+            if self.producer_done:
+                raise RuntimeError(f"Task {self.task_id} finished but {self.stream} does not exist (expired?).")
+            self.producer_done = True
+
+
+class ChunkWriter:
+    """
+    Publishes the incremental output of one task. Every chunk is its own XADD,
+    so consumers see it immediately; `close` appends the end marker that tells
+    them the output is complete (or failed). A task that closes without having
+    written anything publishes its whole result as a single chunk, so consumers
+    behave the same whether or not the producer streamed.
+
+    Each writer is one attempt: its first entry is a start marker and its
+    chunks carry the attempt id. A producer retried after a crash writes a
+    new attempt after the partial one, and consumers switch over to it
+    instead of receiving the output twice. `restart` begins a new attempt
+    from the same writer. `keepalive`, if given, is called on every write so
+    a long-running producer is not reclaimed and retried while it streams.
+    """
+    def __init__(self, redis_client, job_id: str, task_id: str, ttl: int = None, keepalive=None):
+        self.redis_client = redis_client
+        self.keepalive = keepalive
+        self.stream = chunk_stream(job_id, task_id)
+        self.ttl = ttl or CHUNK_TTL_SECONDS
+        self.attempt = uuid.uuid4().hex
+        self.started = False
+        self.written = 0
+        self.closed = False
+
+    def _queue_start(self, pipe):
+        if not self.started:
+            queue_start(pipe, self.stream, self.attempt, self.ttl)
+            self.started = True
+
+    def write(self, chunk):
+        if self.keepalive is not None:
+            self.keepalive()
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_start(pipe)
+        queue_chunk(pipe, self.stream, chunk, self.ttl, self.attempt)
+        pipe.execute()
+        self.written += 1
+
+    def restart(self):
+        if self.started:
+            self.attempt = uuid.uuid4().hex
+            self.started = False
+        self.written = 0
+
+    def close(self, result=None, error: Exception = None):
+        if self.closed:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        if error is None:
+            self._queue_start(pipe)
+        queue_end(pipe, self.stream, result=None if self.written else result, error=error, ttl=self.ttl,
+                  attempt=self.attempt)
+        pipe.execute()
+        self.closed = True
+
+
+def iter_chunks(redis_client, job_id: str, task_id: str, timeout: float = None, count: int = 100, keepalive=None):
+    """
+    Yields the chunks task `task_id` of job `job_id` writes, from the first
+    one, blocking for chunks that are still being produced, until the end
+    marker. Raises RuntimeError if the producer or its job failed,
+    TimeoutError after `timeout` seconds without a chunk once the producer
+    started, and ChunkStreamRestarted if the producer was retried after
+    chunks were yielded. `keepalive`, if given, is called while waiting
+    (e.g. to keep the consumer's own task from looking stranded).
+
+    Chunks are only yielded once the reader caught up with the stream (a
+    read returned less than `count` entries), so the output of attempts that
+    were abandoned before the reader started is skipped rather than
+    restarting it.
+    """
+    reader = _ChunkReader(job_id, task_id, timeout)
+    pending, yielded, backlog = [], False, False
+    while True:
+        if keepalive is not None:
+            keepalive()
+        reply = redis_client.xread({reader.stream: reader.last_id}, count=count,
+                                   block=None if backlog else reader.block_ms())
+        backlog = sum(len(entries) for _, entries in reply or []) >= count
+        read = reader.feed(reply)
+        if read is None:
+            if reader.waiting_for_producer:
+                key, fields = reader.job_fields()
+                reader.check_job(*redis_client.hmget(key, fields))
+            chunks, ended, restarted = [], False, False
+        else:
+            chunks, ended, restarted = read
+        if restarted:
+            if yielded:
+                raise ChunkStreamRestarted(f"Task {task_id} was retried while its chunks were being read.")
+            pending = []
+        pending += chunks
+        if backlog and not ended:
+            continue
+        yielded = yielded or bool(pending)
+        yield from pending
+        pending = []
+        if ended:
+            return
+
+async def collect_chunks_async(redis_client, job_id: str, task_id: str, timeout: float = None, count: int = 100,
+                               keepalive=None) -> list:
+    """
+    asyncio counterpart of `iter_chunks` that waits for the whole output,
+    starting over when the producer is retried; `keepalive` is a coroutine
+    function.
+    """
+    reader = _ChunkReader(job_id, task_id, timeout)
+    collected = []
+    while True:
+        if keepalive is not None:
+            await keepalive()
+        read = reader.feed(await redis_client.xread({reader.stream: reader.last_id}, count=count, block=reader.block_ms()))
+        if read is None:
+            if reader.waiting_for_producer:
+                key, fields = reader.job_fields()
+                reader.check_job(*await redis_client.hmget(key, fields))
+            # Some clients return immediately instead of blocking; do not spin
+            await asyncio.sleep(0.01)
+            continue
+        chunks, ended, restarted = read
+        collected = chunks if restarted else collected + chunks
+        if ended:
+            return collected
@@ -0,0 +1,239 @@
+# /agentic-ai-system/supervisor.py
+
+import os
+import math
+import time
+import signal
+import logging
+import multiprocessing
+from redis_client import get_redis_client
+
+SUPERVISOR_INTERVAL = float(os.getenv("SUPERVISOR_INTERVAL", 5))
+# Backlog (undelivered + pending entries) one worker process is expected to absorb
+AUTOSCALE_TARGET_BACKLOG = int(os.getenv("AUTOSCALE_TARGET_BACKLOG", 50))
+AUTOSCALE_MIN_WORKERS = int(os.getenv("AUTOSCALE_MIN_WORKERS", 1))
+AUTOSCALE_MAX_WORKERS = int(os.getenv("AUTOSCALE_MAX_WORKERS", 4))
+AUTOSCALE_COOLDOWN = float(os.getenv("AUTOSCALE_COOLDOWN", 30))
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", 60))
+RESTART_BACKOFF_MAX = float(os.getenv("RESTART_BACKOFF_MAX", 60))
+
+
+def run_until_terminated(service):
+    """
+    Runs `service` (an agent or orchestrator) until it returns, turning SIGTERM
+    and SIGINT into a graceful `service.stop()` so a draining worker finishes
+    and acknowledges the batch it is working on before it exits.
+    """
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: service.stop())
+    service.run()
+
+
+class WorkerPool:
+    """
+    A group of identical worker processes started with `target(*args,
+    metrics_port=...)`. Pools with `streams` and a `group` are autoscaled on
+    the backlog of that consumer group, summed over the streams (e.g. an
+    agent's priority task streams), between `min_workers` and `max_workers`;
+    pools without streams keep exactly `min_workers` processes running.
+    """
+    def __init__(self, name: str, target, args: tuple = (), streams: list = None, group: str = None,
+                 min_workers: int = None, max_workers: int = None, metrics_port: int = None):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.streams = list(streams or [])
+        self.group = group
+        env_name = name.upper()
+        self.min_workers = min_workers if min_workers is not None else int(
+            os.getenv(f"AUTOSCALE_MIN_WORKERS_{env_name}", AUTOSCALE_MIN_WORKERS))
+        if max_workers is None:
+            max_workers = int(os.getenv(f"AUTOSCALE_MAX_WORKERS_{env_name}", AUTOSCALE_MAX_WORKERS)) if self.streams else self.min_workers
+        self.max_workers = max(max_workers, self.min_workers)
+        # First metrics port of the pool; worker slot i serves on metrics_port + i
+        self.metrics_port = metrics_port
+        self.active = {}     # slot -> Process
+        self.draining = {}   # slot -> (Process, drain deadline)
+        self.desired = self.min_workers
+        self.last_scaled = 0.0
+        self.crash_streak = 0
+        self.restart_at = 0.0
+
+    @property
+    def autoscaled(self) -> bool:
+        return bool(self.streams) and self.max_workers > self.min_workers
+
+    def free_slot(self):
+        # Draining workers keep their slot, so active + draining never exceeds max_workers
+        for slot in range(self.max_workers):
+            if slot not in self.active and slot not in self.draining:
+                return slot
+        return None
+
+
+class Supervisor:
+    """
+    Starts, restarts and autoscales worker processes. Every `interval` seconds
+    it reads the lag and pending count of each autoscaled pool's consumer
+    group (one pipelined XINFO GROUPS), sizes the pool to
+    ceil(backlog / target_backlog) workers within its bounds, drains surplus
+    workers with SIGTERM (killing them after `drain_timeout`), and restarts
+    workers that exited without being asked to, with exponential backoff.
+    Scale-ups are immediate; scale-downs wait for `cooldown` seconds after the
+    last change of the pool.
+    """
+    def __init__(self, redis_client=None, interval: float = None, target_backlog: int = None,
+                 cooldown: float = None, drain_timeout: float = None):
+        self.redis_client = redis_client or get_redis_client()
+        self.interval = SUPERVISOR_INTERVAL if interval is None else interval
+        self.target_backlog = target_backlog or AUTOSCALE_TARGET_BACKLOG
+        self.cooldown = AUTOSCALE_COOLDOWN if cooldown is None else cooldown
+        self.drain_timeout = DRAIN_TIMEOUT if drain_timeout is None else drain_timeout
+        self.logger = logging.getLogger("Supervisor")
+        self.pools = {}
+        self._stopping = False
+
+    def add_pool(self, pool: WorkerPool) -> WorkerPool:
+        self.pools[pool.name] = pool
+        return pool
+
+    def _start_worker(self, pool: WorkerPool, slot: int):
+        port = pool.metrics_port + slot if pool.metrics_port else None
+        process = multiprocessing.Process(
+            target=pool.target, args=pool.args, kwargs={"metrics_port": port}, name=f"{pool.name}-{slot}"
+        )
+        process.start()
+        pool.active[slot] = process
+        self.logger.info(f"Started {process.name} (pid {process.pid}).")
+
+    def _drain_worker(self, pool: WorkerPool, slot: int):
+        process = pool.active.pop(slot)
+        process.terminate()  # SIGTERM -> graceful stop, see run_until_terminated
+        pool.draining[slot] = (process, time.monotonic() + self.drain_timeout)
+        self.logger.info(f"Draining {process.name} (pid {process.pid}).")
+
+    def backlogs(self) -> dict:
+        """
+        Returns {pool name: undelivered + pending entries} for autoscaled pools.
+        Consumer-group `lag` needs Redis >= 7; older servers (and groups whose lag
+        is unknown after trimming) fall back to counting the undelivered entries,
+        bounded by what the pool could use.
+        """
+        pools = [pool for pool in self.pools.values() if pool.autoscaled]
+        if not pools:
+            return {}
+        targets = [(pool, stream) for pool in pools for stream in pool.streams]
+        pipe = self.redis_client.pipeline(transaction=False)
+        for _, stream in targets:
+            pipe.xinfo_groups(stream)
+        replies = pipe.execute(raise_on_error=False)
+
+        backlogs = {pool.name: 0 for pool in pools}
+        for (pool, stream), groups in zip(targets, replies):
+            if isinstance(groups, Exception):
+                # The stream does not exist until the first task or agent creates it
+                continue
+            group = next((g for g in groups if g.get("name") == pool.group), None)
+            if group is None:
+                continue
+            lag = group.get("lag")
+            if lag is None:
+                limit = pool.max_workers * self.target_backlog
+                lag = len(self.redis_client.xrange(stream, min=f"({group['last-delivered-id']}", count=limit))
+            backlogs[pool.name] += lag + group.get("pending", 0)
+        return backlogs
+
+    def _reap(self, pool: WorkerPool, now: float):
+        for slot, (process, deadline) in list(pool.draining.items()):
+            if not process.is_alive():
+                process.join()
+                del pool.draining[slot]
+                self.logger.info(f"{process.name} drained (exit code {process.exitcode}).")
+            elif now >= deadline:
+                self.logger.warning(f"{process.name} did not drain within {self.drain_timeout}s; killing it.")
+                process.kill()
+
+        for slot, process in list(pool.active.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del pool.active[slot]
+            pool.crash_streak += 1
+            delay = min(RESTART_BACKOFF_MAX, 2 ** (pool.crash_streak - 1))
+            pool.restart_at = max(pool.restart_at, now + delay)
+            self.logger.error(f"{process.name} exited unexpectedly (exit code {process.exitcode}); restarting in {delay:.0f}s.")
+
+    def _scale(self, pool: WorkerPool, now: float):
+        if len(pool.active) < pool.desired:
+            if now < pool.restart_at:
+                return
+            while len(pool.active) < pool.desired:
+                slot = pool.free_slot()
+                if slot is None:
+                    break  # wait for draining workers to exit
+                self._start_worker(pool, slot)
+            pool.last_scaled = now
+        elif len(pool.active) > pool.desired and now - pool.last_scaled >= self.cooldown:
+            # One worker per round: the backlog is re-measured before the next one goes
+            self._drain_worker(pool, max(pool.active))
+            pool.last_scaled = now
+
+    def step(self):
+        """
+        One control-loop round: reap exited workers, re-size autoscaled pools
+        from their backlog, then start or drain workers to match.
+        """
+        now = time.monotonic()
+        backlogs = self.backlogs()
+        for pool in self.pools.values():
+            self._reap(pool, now)
+            if pool.name in backlogs:
+                desired = math.ceil(backlogs[pool.name] / self.target_backlog)
+                desired = min(pool.max_workers, max(pool.min_workers, desired))
+                if desired != pool.desired:
+                    self.logger.info(
+                        f"Scaling {pool.name}: backlog {backlogs[pool.name]} -> {desired} workers (was {pool.desired})."
+                    )
+                    pool.desired = desired
+            # Workers that stay up for a full cooldown reset the restart backoff
+            if pool.crash_streak and now - pool.restart_at > self.cooldown and len(pool.active) >= pool.desired:
+                pool.crash_streak = 0
+            self._scale(pool, now)
+
+    def run(self):
+        """
+        Runs the control loop until `stop()` (or SIGTERM), then drains every worker.
+        """
+        self.logger.info(f"Supervising pools: {', '.join(self.pools)}.")
+        while not self._stopping:
+            try:
+                self.step()
+            except Exception as e:
+                self.logger.error(f"Error in supervisor loop: {e}", exc_info=True)
+            time.sleep(self.interval)
+        self.shutdown()
+
+    def stop(self):
+        self._stopping = True
+
+    def shutdown(self):
+        """
+        Drains all workers and waits for them to exit.
+        """
+        for pool in self.pools.values():
+            for slot in list(pool.active):
+                self._drain_worker(pool, slot)
+        for pool in self.pools.values():
+            for slot, (process, deadline) in list(pool.draining.items()):
+                process.join(max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+                del pool.draining[slot]
+        self.logger.info("All workers stopped.")
+
+    def status(self) -> dict:
+        return {
+            name: {"desired": pool.desired, "active": len(pool.active), "draining": len(pool.draining)}
+            for name, pool in self.pools.items()
+        }
@@ -0,0 +1,187 @@
+# /agentic-ai-system/task_cache.py
+
+import json
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import codec
+
+CACHE_PREFIX = "cache:"
+
+
+class TaskResultCache:
+    """
+    Memoizes an agent's task results across jobs. A small in-process LRU sits
+    in front of a shared Redis tier (`cache:<agent>:<sha256>`, expiring after
+    `ttl` seconds), and concurrent identical tasks inside one process are
+    coalesced so only one of them executes (single flight). Local entries
+    expire with the Redis entry they mirror.
+    """
+    def __init__(self, redis_client, agent_name: str, ttl: int, blobs=None, local_size: int = 256):
+        self.redis_client = redis_client
+        self.agent_name = agent_name
+        self.ttl = ttl
+        self.blobs = blobs
+        self.local_size = local_size
+        self.logger = logging.getLogger(f"{agent_name}.cache")
+        self._local = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "coalesced": 0}
+
+    def key_for(self, task_data: dict) -> str:
+        """
+        Canonical hash of the task details: key order and the routing/tracing
+        fields in codec.TASK_META_FIELDS do not affect the key.
+        """
+        details = {k: v for k, v in dict(task_data).items() if k not in codec.TASK_META_FIELDS}
+        canonical = json.dumps(details, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return f"{CACHE_PREFIX}{self.agent_name}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+    def _remember(self, key, result, ttl: float = None):
+        # Kept locally for `ttl` seconds (default: the full cache TTL)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._local[key] = (result, expires_at)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _local_hit(self, key):
+        # -> (True, result) for a live local entry; call with the lock held
+        entry = self._local.get(key)
+        if entry is None:
+            return False, None
+        if entry[1] <= time.monotonic():
+            del self._local[key]
+            return False, None
+        self._local.move_to_end(key)
+        self._stats["local_hits"] += 1
+        return True, entry[0]
+
+    def _load(self, key):
+        # -> (result, seconds until the entry expires), or (None, None)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hmget(key, ["encoding", "result"])
+        pipe.pttl(key)
+        (encoding, data), pttl = pipe.execute()
+        if data is None:
+            return None, None
+        if self.blobs is not None:
+            data = self.blobs.resolve(data)
+        return codec.decode(data, encoding), pttl / 1000 if pttl > 0 else None
+
+    def _store(self, key, result):
+        tag, data = codec.encode(result)
+        if self.blobs is not None:
+            data = self.blobs.offload(data)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset(key, mapping={"encoding": tag, "result": data})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def get_or_compute(self, task_data: dict, compute):
+        """
+        Returns the cached result for `task_data`, or runs `compute(task_data)`
+        once and caches its result. Exceptions are propagated to every caller
+        waiting on the same execution and are never cached.
+        """
+        key = self.key_for(task_data)
+        owner = False
+        with self._lock:
+            hit, result = self._local_hit(key)
+            if hit:
+                return result
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+            else:
+                future = self._in_flight[key] = Future()
+                owner = True
+        if not owner:
+            return future.result()
+
+        try:
+            try:
+                result, ttl = self._load(key)
+            except Exception as e:
+                self.logger.warning(f"Could not read cache entry {key}: {e}")
+                result, ttl = None, None
+            if result is not None:
+                with self._lock:
+                    self._stats["redis_hits"] += 1
+            else:
+                with self._lock:
+                    self._stats["misses"] += 1
+                result = compute(task_data)
+                try:
+                    self._store(key, result)
+                except Exception as e:
+                    self.logger.warning(f"Could not write cache entry {key}: {e}")
+            self._remember(key, result, ttl)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def get_or_compute_many(self, tasks: list, compute_batch) -> list:
+        """
+        Batch counterpart of get_or_compute: cached tasks are answered from the
+        cache and the misses are computed with a single `compute_batch(misses)`
+        call. Items of the computed list may be exceptions, which are returned
+        as-is and never cached. Misses are not coalesced with identical tasks
+        in flight elsewhere in the process.
+        """
+        results = [None] * len(tasks)
+        misses = []
+        for index, task_data in enumerate(tasks):
+            key = self.key_for(task_data)
+            with self._lock:
+                hit, result = self._local_hit(key)
+            if hit:
+                results[index] = result
+                continue
+            try:
+                result, ttl = self._load(key)
+            except Exception as e:
+                self.logger.warning(f"Could not read cache entry {key}: {e}")
+                result, ttl = None, None
+            if result is None:
+                misses.append((index, key))
+                continue
+            with self._lock:
+                self._stats["redis_hits"] += 1
+            self._remember(key, result, ttl)
+            results[index] = result
+
+        if misses:
+            with self._lock:
+                self._stats["misses"] += len(misses)
+            computed = compute_batch([tasks[index] for index, _ in misses])
+            for (index, key), result in zip(misses, computed):
+                results[index] = result
+                if isinstance(result, Exception):
+                    continue
+                try:
+                    self._store(key, result)
+                except Exception as e:
+                    self.logger.warning(f"Could not write cache entry {key}: {e}")
+                self._remember(key, result)
+        return results
+
+    def stats(self) -> dict:
+        """
+        Hit/miss/coalesce counters since the cache was created.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -2,9 +2,12 @@
 import logging
 from typing import Optional
 import uuid
+import zlib
 import json
 import ast
 
+logger = logging.getLogger("utils")
+
 def setup_logging():
     """
     Configures basic logging for the application.
@@ -21,6 +24,24 @@ def generate_job_id():
     """
     return str(uuid.uuid4())
 
+def job_shard(job_id: str, shard_count: int) -> int:
+    """
+    Maps a job to one of `shard_count` orchestrator shards. Stable across
+    processes and Python versions (unlike the built-in, salted `hash`).
+    """
+    if shard_count <= 1:
+        return 0
+    return zlib.crc32(job_id.encode("utf-8")) % shard_count
+
+def shard_stream(prefix: str, agent_name: str, shard=None) -> str:
+    """
+    Name of an agent's result or error stream for a shard, e.g.
+    `results:web_search:3`. Unsharded deployments keep `results:web_search`.
+    """
+    if shard is None or shard == "":
+        return f"{prefix}{agent_name}"
+    return f"{prefix}{agent_name}:{shard}"
+
 def robust_string_to_dict(input_str: str) -> Optional[dict]:
     """
     Tries to convert a string into a Python dictionary using multiple strategies.
@@ -32,7 +53,7 @@ def robust_string_to_dict(input_str: str) -> Optional[dict]:
         A dictionary if conversion is successful, otherwise None.
     """
     if not isinstance(input_str, str):
-        print("Error: Input must be a string.")
+        logger.debug("Input must be a string.")
         return None
 
     s = input_str.strip() # Remove leading/trailing whitespace
@@ -42,7 +63,7 @@ def robust_string_to_dict(input_str: str) -> Optional[dict]:
         data = json.loads(s)
         if isinstance(data, dict):
             # It's valid JSON and it's an object (dict)
-            print("Success: Parsed as valid JSON.")
+            logger.debug("Parsed as valid JSON.")
             return data
     except json.JSONDecodeError:
         # Not valid JSON, proceed to the next strategy
@@ -53,7 +74,7 @@ def robust_string_to_dict(input_str: str) -> Optional[dict]:
         data = ast.literal_eval(s)
         if isinstance(data, dict):
             # It's a valid Python literal and it's a dict
-            print("Success: Parsed as a Python dictionary literal.")
+            logger.debug("Parsed as a Python dictionary literal.")
             return data
     except (ValueError, SyntaxError):
         # Not a valid Python literal, proceed to the next strategy
@@ -65,13 +86,13 @@ def robust_string_to_dict(input_str: str) -> Optional[dict]:
         cleaned_str = s.replace("\\'", "'")
         data = ast.literal_eval(cleaned_str)
         if isinstance(data, dict):
-            print("Success: Parsed after cleaning escaped quotes.")
+            logger.debug("Parsed after cleaning escaped quotes.")
             return data
     except (ValueError, SyntaxError):
         pass
 
     # Final Fallback: If all parsing fails
-    print("Error: Could not parse the string into a dictionary using any method.")
+    logger.warning("Could not parse the string into a dictionary using any method.")
     # Option 1: Return None (as we are doing here)
     return None
     # Option 2: You could also return a dictionary with an error message